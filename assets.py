@@ -0,0 +1,104 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+from flask import current_app
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+#Files worth storing compressed; images and woff fonts already are
+COMPRESSIBLE = ('.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.ttf', '.eot', '.otf')
+
+MANIFEST = 'manifest.json'
+
+
+#Name of a file with the first 12 hex digits of its content hash before the extension
+def fingerprinted_name(path, data):
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    root, extension = os.path.splitext(path)
+    return '{}.{}{}'.format(root, digest, extension)
+
+#Writes gzip and, when the brotli package is installed, brotli siblings of
+#path next to it, skipping any that would not be smaller than the original
+def write_compressed(path, data):
+    written = []
+    variants = [('.gz', lambda raw: gzip.compress(raw, 9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', lambda raw: brotli.compress(raw, quality=11)))
+    for suffix, compress in variants:
+        compressed = compress(data)
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as output:
+                output.write(compressed)
+            written.append(suffix)
+    return written
+
+#Copies every file under source_dir into build_dir under a fingerprinted
+#name, writes precompressed siblings and a manifest mapping each source path
+#to its fingerprinted path, and returns the manifest. Assets whose content did
+#not change keep their name, so browsers keep their cached copies.
+def build_assets(source_dir, build_dir, compress=True):
+    source_dir = os.path.abspath(source_dir)
+    build_dir = os.path.abspath(build_dir)
+    manifest = {}
+    for root, dirs, files in os.walk(source_dir):
+        if os.path.abspath(root) == build_dir or os.path.abspath(root).startswith(build_dir + os.sep):
+            dirs[:] = []
+            continue
+        dirs.sort()
+        for name in sorted(files):
+            if name.startswith('.'):
+                continue
+            source = os.path.join(root, name)
+            relative = os.path.relpath(source, source_dir).replace(os.sep, '/')
+            with open(source, 'rb') as asset:
+                data = asset.read()
+            target_name = fingerprinted_name(relative, data)
+            target = os.path.join(build_dir, target_name)
+            if not os.path.isdir(os.path.dirname(target)):
+                os.makedirs(os.path.dirname(target))
+            if not os.path.exists(target):
+                shutil.copyfile(source, target)
+                if compress and relative.lower().endswith(COMPRESSIBLE):
+                    write_compressed(target, data)
+            manifest[relative] = target_name
+
+    #written last and swapped in whole so a running app never reads half a manifest
+    partial = os.path.join(build_dir, MANIFEST + '.tmp')
+    with open(partial, 'w', encoding='utf-8') as output:
+        json.dump(manifest, output, indent=2, sort_keys=True)
+    os.replace(partial, os.path.join(build_dir, MANIFEST))
+    return manifest
+
+#Returns the manifest in build_dir, or an empty one when assets were not built
+def load_manifest(build_dir):
+    try:
+        with open(os.path.join(build_dir, MANIFEST), encoding='utf-8') as manifest:
+            return json.load(manifest)
+    except (IOError, OSError, ValueError):
+        return {}
+
+#The manifest of the running app, read from ASSETS_BUILD_DIR on first use.
+#Templates link assets through asset_url(), which falls back to the plain
+#/static/ file for anything not in the manifest, so an unbuilt checkout still works.
+asset_manifest = {"files": None, "version": None}
+
+def set_asset_manifest(files):
+    asset_manifest["version"] = hashlib.sha1(repr(sorted(files.items())).encode('utf-8')).hexdigest()[:12]
+    asset_manifest["files"] = files
+
+def get_asset_manifest():
+    if asset_manifest["files"] is None:
+        set_asset_manifest(load_manifest(current_app.config.get('ASSETS_BUILD_DIR', 'build/static')))
+    return asset_manifest["files"]
+
+#Changes whenever a build changes any asset name, so cached pages and page
+#validators never outlive the asset URLs they link to
+def asset_version():
+    get_asset_manifest()
+    return asset_manifest["version"]
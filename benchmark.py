@@ -0,0 +1,137 @@
+#Startup benchmarks. Every measurement runs in a fresh interpreter so it pays
+#the same costs as a newly started worker.
+#
+#  python benchmark.py templates [--runs N]
+#
+#compares the first request of a worker with templates compiled on demand,
+#loaded from the bytecode cache, and warmed from the cache at startup.
+#
+#  python benchmark.py import-time [--runs N]
+#
+#times a cold start: importing app, create_app() and the first request, and
+#lists the modules that take longest to import.
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+#The benchmarks never query the database, so none has to be running
+BASE_OVERRIDES = {"SQLALCHEMY_DATABASE_URI": 'sqlite://'}
+
+#Runs in the child: applies config overrides, imports the app and times the
+#first and second request for a page that needs no database, then the load of
+#every remaining template, which the first hit of each page pays in turn
+TEMPLATES_CHILD = '''
+import json, sys, time
+import config
+for key, value in json.loads(sys.argv[1]).items():
+    setattr(config, key, value)
+started = time.perf_counter()
+import app as application
+flask_app = application.create_app()
+booted = time.perf_counter()
+client = flask_app.test_client()
+timings = {"boot_ms": (booted - started) * 1000}
+for label in ("first_request_ms", "second_request_ms"):
+    started = time.perf_counter()
+    client.get('/benchmark-missing-page')
+    timings[label] = (time.perf_counter() - started) * 1000
+started = time.perf_counter()
+application.load_templates(flask_app)
+timings["remaining_templates_ms"] = (time.perf_counter() - started) * 1000
+print(json.dumps(timings))
+'''
+
+#Runs in the child: times importing the app module, building the app and its
+#first request separately, so a module that is imported too early shows up in
+#the step that pays for it
+IMPORT_CHILD = '''
+import json, sys, time
+import config
+for key, value in json.loads(sys.argv[1]).items():
+    setattr(config, key, value)
+started = time.perf_counter()
+import app as application
+imported = time.perf_counter()
+flask_app = application.create_app()
+created = time.perf_counter()
+flask_app.test_client().get('/benchmark-missing-page')
+served = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "create_app_ms": (created - imported) * 1000,
+    "first_request_ms": (served - created) * 1000,
+    "total_ms": (served - started) * 1000
+}))
+'''
+
+
+def run_child(code, overrides):
+    output = subprocess.check_output(
+        [sys.executable, '-c', code, json.dumps(dict(BASE_OVERRIDES, **overrides))], cwd=basedir)
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+def median_timings(code, overrides, runs):
+    samples = [run_child(code, overrides) for _ in range(runs)]
+    return dict((key, sorted(sample[key] for sample in samples)[runs // 2]) for key in samples[0])
+
+def report(rows):
+    keys = list(rows[0][1])
+    print('{:<22}'.format('') + ''.join('{:>24}'.format(key) for key in keys))
+    for label, timings in rows:
+        print('{:<22}'.format(label) + ''.join('{:>24.1f}'.format(timings[key]) for key in keys))
+
+def benchmark_templates(runs):
+    cache_dir = tempfile.mkdtemp(prefix='template-cache-')
+    try:
+        cold = {"TEMPLATE_CACHE_DIR": None, "TEMPLATE_WARMUP": False}
+        cached = {"TEMPLATE_CACHE_DIR": cache_dir, "TEMPLATE_WARMUP": False}
+        warmed = {"TEMPLATE_CACHE_DIR": cache_dir, "TEMPLATE_WARMUP": True}
+        #the first cached run fills the cache the way precompile-templates does
+        run_child(TEMPLATES_CHILD, cached)
+        report([
+            ('compiled on demand', median_timings(TEMPLATES_CHILD, cold, runs)),
+            ('bytecode cache', median_timings(TEMPLATES_CHILD, cached, runs)),
+            ('warmed at startup', median_timings(TEMPLATES_CHILD, warmed, runs))
+        ])
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+#Import time of each top-level package during a cold start, from -X importtime
+def slowest_imports(overrides, limit):
+    output = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', IMPORT_CHILD, json.dumps(dict(BASE_OVERRIDES, **overrides))],
+        cwd=basedir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True).stderr.decode('utf-8')
+    totals = Counter()
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative, name = line[len('import time:'):].split('|')
+        totals[name.strip().split('.')[0]] += int(self_us)
+    return totals.most_common(limit)
+
+def benchmark_import_time(runs):
+    report([
+        ('templates warmed', median_timings(IMPORT_CHILD, {"TEMPLATE_WARMUP": True}, runs)),
+        ('templates on demand', median_timings(IMPORT_CHILD, {"TEMPLATE_WARMUP": False}, runs))
+    ])
+    print('\nslowest imports (ms)')
+    for name, self_us in slowest_imports({}, 10):
+        print('{:<22}{:>24.1f}'.format(name, self_us / 1000.0))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Worker startup benchmarks')
+    parser.add_argument('benchmark', choices=['templates', 'import-time'])
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes per scenario; the median is reported')
+    arguments = parser.parse_args()
+    if arguments.benchmark == 'templates':
+        benchmark_templates(arguments.runs)
+    elif arguments.benchmark == 'import-time':
+        benchmark_import_time(arguments.runs)
@@ -0,0 +1,170 @@
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+#In-process cache: least recently used entries are evicted past max_entries
+#and every entry expires ttl seconds after it was stored
+class MemoryCache(object):
+
+    def __init__(self, max_entries=1024, default_ttl=300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get_many(self, keys):
+        now = time.time()
+        values = []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] is not None and entry[0] < now:
+                    del self._entries[key]
+                    entry = None
+                if entry is None:
+                    values.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    values.append(entry[1])
+        return values
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    #ttl=0 keeps the entry until it is evicted
+    def set(self, key, value, ttl=None):
+        if ttl is None:
+            ttl = self.default_ttl
+        with self._lock:
+            self._store(key, value, ttl)
+
+    #Stores value only if key is not cached yet
+    def add(self, key, value, ttl=None):
+        if ttl is None:
+            ttl = self.default_ttl
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is None or entry[0] >= time.time()):
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def _store(self, key, value, ttl):
+        self._entries[key] = (time.time() + ttl if ttl else None, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+#Out-of-process cache kept in Redis, shared by every worker and host. Values
+#are pickled; client is any redis-py compatible client, such as
+#fakeredis.FakeRedis() standing in for a server.
+class RedisCache(object):
+
+    def __init__(self, client, prefix='sombrezos:', default_ttl=300):
+        self.client = client
+        self.prefix = prefix
+        self.default_ttl = default_ttl
+
+    #The client library is imported here, so processes using the memory
+    #backend never load it
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        if url.startswith('fakeredis://'):
+            import fakeredis
+            return cls(fakeredis.FakeRedis(), **kwargs)
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('the redis cache backend needs the redis package')
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get_many(self, keys):
+        values = self.client.mget([self.prefix + key for key in keys])
+        return [None if value is None else pickle.loads(value) for value in values]
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def set(self, key, value, ttl=None):
+        if ttl is None:
+            ttl = self.default_ttl
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or None)
+
+    def add(self, key, value, ttl=None):
+        if ttl is None:
+            ttl = self.default_ttl
+        return bool(self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or None, nx=True))
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+#Tag-based invalidation over either backend.
+#Every tag has a random version stored next to the entries. An entry is saved
+#with the versions of its tags as they were before its value was computed and
+#is served only while all of them are unchanged, so invalidating a tag is a
+#single write however many entries carry it, and a value computed from data
+#read before an invalidation is never served after it. A tag version that was
+#evicted or expired makes its entries miss, never serve stale.
+class TaggedCache(object):
+
+    def __init__(self, backend, default_ttl=None):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def _tag_versions(self, tags):
+        tag_keys = ['tag:' + tag for tag in tags]
+        versions = self.backend.get_many(tag_keys)
+        missing = [tag_key for tag_key, version in zip(tag_keys, versions) if version is None]
+        if missing:
+            for tag_key in missing:
+                self.backend.add(tag_key, uuid.uuid4().hex, 0)
+            versions = self.backend.get_many(tag_keys)
+        return tuple(versions)
+
+    #Returns the cached value for key, or stores and returns compute().
+    #A computed value of None is returned without being stored.
+    def fetch(self, key, tags, compute, ttl=None):
+        tags = sorted(set(tags))
+        values = self.backend.get_many(['entry:' + key] + ['tag:' + tag for tag in tags])
+        entry, versions = values[0], tuple(values[1:])
+        if entry is not None and None not in versions and entry[0] == versions:
+            self.stats["hits"] += 1
+            return entry[1]
+        self.stats["misses"] += 1
+        if None in versions:
+            versions = self._tag_versions(tags)
+        value = compute()
+        if value is None:
+            return None
+        self.backend.set('entry:' + key, (versions, value), self.default_ttl if ttl is None else ttl)
+        return value
+
+    def invalidate(self, tags):
+        for tag in set(tags):
+            self.backend.set('tag:' + tag, uuid.uuid4().hex, 0)
+            self.stats["invalidations"] += 1
+
+    def clear(self):
+        self.backend.clear()
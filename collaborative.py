@@ -0,0 +1,39 @@
+import numpy as np
+from scipy import sparse
+
+
+#Builds the item-item co-occurrence matrix from chunks of (user_id, vendor_id)
+#pairs and returns the top_n neighbors of every vendor as
+#{vendor_id: [(neighbor_id, score), ...]}. The score of two vendors is the
+#number of users that interacted with both; duplicate pairs count once.
+def top_co_preferred(chunks, top_n=10):
+    users = []
+    vendors = []
+    for chunk in chunks:
+        if len(chunk) == 0:
+            continue
+        pairs = np.asarray(chunk, dtype=np.int64).reshape(-1, 2)
+        users.append(pairs[:, 0])
+        vendors.append(pairs[:, 1])
+    if not users:
+        return {}
+
+    users = np.concatenate(users)
+    vendors = np.concatenate(vendors)
+    interactions = sparse.csr_matrix((np.ones(len(users), dtype=np.int32), (users, vendors)))
+    interactions.sum_duplicates()
+    interactions.data[:] = 1
+
+    co_occurrence = (interactions.T.tocsr() @ interactions).tocsr()
+    co_occurrence.setdiag(0)
+    co_occurrence.eliminate_zeros()
+
+    neighbors = {}
+    indptr, indices, data = co_occurrence.indptr, co_occurrence.indices, co_occurrence.data
+    for vendor_id in np.flatnonzero(np.diff(indptr)):
+        start, end = indptr[vendor_id], indptr[vendor_id + 1]
+        columns = indices[start:end]
+        scores = data[start:end]
+        order = np.lexsort((columns, -scores))[:top_n]
+        neighbors[int(vendor_id)] = [(int(columns[i]), int(scores[i])) for i in order]
+    return neighbors
@@ -0,0 +1,34 @@
+from flask import g
+
+from loaders import BatchLoader
+
+#Returns this request's BatchLoader for model, so helpers that need many rows
+#by primary key share one IN query and repeated lookups of the same row in
+#one request never reach the database again
+def loader_for(model):
+  loaders = g.setdefault('loaders', {})
+  if model not in loaders:
+    def fetch(ids):
+      return dict((row.id, row) for row in model.query.filter(model.id.in_(ids)))
+    loaders[model] = BatchLoader(fetch)
+  return loaders[model]
+
+#Read-through primary key lookup, cached for the rest of the request
+def get_entity(model, pk):
+  if pk is None or pk == '':
+    return None
+  return loader_for(model).load(int(pk))
+
+#Hits and misses of the request-scoped entity cache since the process started
+entity_cache_stats = {"hits": 0, "misses": 0}
+
+#reports this request's entity cache hits and misses and adds them to the totals
+def report_entity_cache(response):
+  loaders = g.get('loaders')
+  if loaders:
+    hits = sum(loader.hits for loader in loaders.values())
+    misses = sum(loader.misses for loader in loaders.values())
+    entity_cache_stats["hits"] += hits
+    entity_cache_stats["misses"] += misses
+    response.headers['X-Entity-Cache'] = 'hits={}; misses={}'.format(hits, misses)
+  return response
@@ -0,0 +1,141 @@
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.orm import object_session
+
+from extensions import db
+from models import rewards, Vendor, User, Deals, Menu
+
+#Vendor and User inserts, updates and deletes are recorded on the session
+#while it flushes and handed to every function in the matching
+#*_change_handlers list once the transaction commits, so in-memory indexes
+#and caches only see changes that were saved. Deal changes reach caches
+#through their cache tags below.
+vendor_change_handlers = []
+user_change_handlers = []
+
+#Names of the tables of the Vendor and User rows a transaction wrote,
+#including vendors whose updated_at a menu or deal change moved
+table_change_handlers = []
+
+cache_tag_handlers = []
+
+change_handlers = {
+  'vendor_changes': vendor_change_handlers,
+  'user_changes': user_change_handlers,
+  'changed_tables': table_change_handlers,
+  'cache_tags': cache_tag_handlers
+}
+
+def vendor_change(action, vendor):
+  cost = vendor.cost
+  if cost is not None and cost != '':
+    cost = int(cost)
+  return {
+    "action": action,
+    "vendor_id": vendor.id,
+    "name": vendor.name,
+    "category": vendor.category,
+    "cuisine": vendor.cuisine,
+    "cost": cost
+  }
+
+def user_change(action, user):
+  return {
+    "action": action,
+    "user_id": user.id,
+    "username": user.username
+  }
+
+def record_change(target, key, change):
+  session = object_session(target)
+  session.info.setdefault(key, []).append(change)
+
+@event.listens_for(Vendor, 'after_insert')
+@event.listens_for(Vendor, 'after_update')
+def capture_vendor_save(mapper, connection, target):
+  record_change(target, 'vendor_changes', vendor_change('save', target))
+
+@event.listens_for(Vendor, 'after_delete')
+def capture_vendor_delete(mapper, connection, target):
+  record_change(target, 'vendor_changes', vendor_change('delete', target))
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+def capture_user_save(mapper, connection, target):
+  record_change(target, 'user_changes', user_change('save', target))
+
+@event.listens_for(User, 'after_delete')
+def capture_user_delete(mapper, connection, target):
+  record_change(target, 'user_changes', user_change('delete', target))
+
+def record_table(mapper, connection, target):
+  record_change(target, 'changed_tables', mapper.local_table.name)
+
+for model in (Vendor, User):
+  for event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(model, event_name, record_table)
+
+#Cache tags of the pages showing a changed row. Writes that go through Core
+#rather than the ORM add their tags with record_cache_tags.
+def record_cache_tags(*tags):
+  db.session.info.setdefault('cache_tags', []).extend(tags)
+
+def tag_vendor(mapper, connection, target):
+  record_change(target, 'cache_tags', 'vendors')
+  record_change(target, 'cache_tags', 'vendor:{}'.format(target.id))
+
+def tag_vendor_children(mapper, connection, target):
+  record_change(target, 'cache_tags', 'vendor:{}'.format(target.vendor_id))
+
+def tag_deal(mapper, connection, target):
+  record_change(target, 'cache_tags', 'deals')
+  record_change(target, 'cache_tags', 'vendor:{}'.format(target.vendor_id))
+
+def tag_user(mapper, connection, target):
+  record_change(target, 'cache_tags', 'users')
+  record_change(target, 'cache_tags', 'user:{}'.format(target.id))
+
+def tag_reward(mapper, connection, target):
+  record_change(target, 'cache_tags', 'user:{}'.format(target.user_id))
+
+for model, tagger in ((Vendor, tag_vendor), (Menu, tag_vendor_children), (Deals, tag_deal), (User, tag_user), (rewards, tag_reward)):
+  for event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(model, event_name, tagger)
+
+#favorites is a plain table, so its rows are tracked through the relationship
+@event.listens_for(User.favorites, 'append')
+@event.listens_for(User.favorites, 'remove')
+def tag_favorites(target, value, initiator):
+  if object_session(target) is not None:
+    record_change(target, 'cache_tags', 'user:{}'.format(target.id))
+
+#Menu and deal changes count as changes to their vendor, so its updated_at and
+#version describe the whole vendor page. The vendors touched by a flush are
+#updated together in one statement at its end.
+def touch_vendor(mapper, connection, target):
+  record_change(target, 'touched_vendors', target.vendor_id)
+
+for model in (Menu, Deals):
+  for event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(model, event_name, touch_vendor)
+
+@event.listens_for(db.session, 'after_flush')
+def touch_vendors(session, flush_context):
+  vendor_ids = session.info.pop('touched_vendors', None)
+  if vendor_ids:
+    session.execute(Vendor.__table__.update().where(Vendor.id.in_(set(vendor_ids))).values(updated_at=datetime.utcnow()))
+    session.info.setdefault('changed_tables', []).append(Vendor.__tablename__)
+
+@event.listens_for(db.session, 'after_commit')
+def publish_changes(session):
+  for key, handlers in change_handlers.items():
+    changes = session.info.pop(key, None)
+    if changes:
+      for handler in handlers:
+        handler(changes)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_changes(session):
+  for key in change_handlers:
+    session.info.pop(key, None)
+  session.info.pop('touched_vendors', None)
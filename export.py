@@ -0,0 +1,34 @@
+import csv
+import io
+import json
+
+
+#Yields the rows of a result as text: a CSV header and rows, or one JSON
+#object per line. Lines are buffered and yielded in pieces of about 64KB, so
+#at most one piece of text is held besides the rows the result has fetched.
+def serialize_rows(columns, rows, fmt):
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(['' if value is None else value for value in row])
+            if buffer.tell() >= 65536:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+        return
+
+    lines = []
+    size = 0
+    for row in rows:
+        line = json.dumps(dict(zip(columns, row)), default=str) + '\n'
+        lines.append(line)
+        size += len(line)
+        if size >= 65536:
+            yield ''.join(lines)
+            lines = []
+            size = 0
+    if lines:
+        yield ''.join(lines)
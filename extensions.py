@@ -0,0 +1,7 @@
+from flask_moment import Moment
+from flask_sqlalchemy import SQLAlchemy
+
+#Extensions are created unbound and attached to an app by create_app(), so
+#models and views can import them without importing the app
+db = SQLAlchemy()
+moment = Moment()
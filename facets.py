@@ -0,0 +1,106 @@
+import threading
+
+#Vendor attributes /vendors can be filtered on, in the order rows are given
+FACET_FIELDS = ('category', 'cuisine', 'cost')
+
+
+#Returns the positions of the set bits of a bitmap, highest first
+def bitmap_positions(bitmap):
+    bits = bin(bitmap)[2:]
+    top = len(bits) - 1
+    return [top - offset for offset, bit in enumerate(bits) if bit == '1']
+
+def bitmap_count(bitmap):
+    return bin(bitmap).count('1')
+
+
+#In-process bitmap index over the vendor facets.
+#Every facet value owns one bitmap (a Python int) with bit n set when vendor n
+#has that value. Values of one facet are ORed together, facets are ANDed, and
+#facet counts are popcounts, so filtering never touches the database.
+class FacetIndex(object):
+
+    def __init__(self):
+        self.built = False
+        self.lock = threading.RLock()
+        self._all = 0
+        self._bitmaps = {}
+        self._vendors = {}
+
+    #Replaces the index with rows of (vendor_id, category, cuisine, cost)
+    def build(self, rows):
+        with self.lock:
+            self._all = 0
+            self._bitmaps = dict((field, {}) for field in FACET_FIELDS)
+            self._vendors = {}
+            for row in rows:
+                self._add(row[0], tuple(row[1:]))
+            self.built = True
+
+    def update(self, vendor_id, attributes):
+        with self.lock:
+            if not self.built or self._vendors.get(vendor_id) == tuple(attributes):
+                return
+            self._discard(vendor_id)
+            self._add(vendor_id, tuple(attributes))
+
+    def remove(self, vendor_id):
+        with self.lock:
+            if self.built:
+                self._discard(vendor_id)
+
+    def _add(self, vendor_id, attributes):
+        bit = 1 << vendor_id
+        self._vendors[vendor_id] = attributes
+        self._all |= bit
+        for field, value in zip(FACET_FIELDS, attributes):
+            if value is not None:
+                bitmaps = self._bitmaps[field]
+                bitmaps[value] = bitmaps.get(value, 0) | bit
+
+    def _discard(self, vendor_id):
+        attributes = self._vendors.pop(vendor_id, None)
+        if attributes is None:
+            return
+        bit = 1 << vendor_id
+        self._all &= ~bit
+        for field, value in zip(FACET_FIELDS, attributes):
+            if value is None:
+                continue
+            bitmaps = self._bitmaps[field]
+            bitmaps[value] &= ~bit
+            if not bitmaps[value]:
+                del bitmaps[value]
+
+    #ORs the bitmaps of the selected values of one facet
+    def _facet(self, field, values):
+        bitmap = 0
+        bitmaps = self._bitmaps[field]
+        for value in values:
+            bitmap |= bitmaps.get(value, 0)
+        return bitmap
+
+    #ANDs the facets in filters ({field: [values]}), skipping the field named in skip
+    def _select(self, filters, skip=None):
+        bitmap = self._all
+        for field in FACET_FIELDS:
+            values = filters.get(field)
+            if values and field != skip:
+                bitmap &= self._facet(field, values)
+        return bitmap
+
+    #Returns the ids of the vendors matching filters, highest id first
+    def select(self, filters):
+        with self.lock:
+            return bitmap_positions(self._select(filters))
+
+    #Returns {field: [(value, count), ...]} where each count is the number of
+    #vendors that would match if that value were selected, given the other facets
+    def counts(self, filters):
+        with self.lock:
+            counts = {}
+            for field in FACET_FIELDS:
+                base = self._select(filters, skip=field)
+                counts[field] = [(value, bitmap_count(base & bitmap))
+                    for value, bitmap in sorted(self._bitmaps[field].items())]
+            return counts
@@ -0,0 +1,243 @@
+import threading
+import time
+from collections import Counter
+from flask import current_app
+from sqlalchemy import func, or_
+
+from entities import loader_for
+from events import vendor_change_handlers, user_change_handlers, table_change_handlers
+from extensions import db
+from models import favorites, Vendor, User, VendorNeighbor
+from search import TrigramIndex, PrefixIndex
+from similarity import SimilarityIndex
+
+#The indexes below live for the whole process and are built from the database
+#on first use. Settings are read from the app that builds them.
+
+#  Freshness
+#  ----------------------------------------------------------------
+#Each process keeps its indexes in step with the changes it commits itself.
+#Writes committed by other workers or by CLI commands are caught with a stamp
+#of the source table taken when an index is built: at most every
+#INDEX_CHECK_INTERVAL seconds the stamp is read again, and an index whose
+#table changed since is rebuilt. The stamps are read again after every commit
+#of this process, once its own changes are applied in place, so those never
+#cause a rebuild.
+
+#Indexes built by current_index, with the state select of their stamp
+built_indexes = []
+
+#The row count and newest change of model's table. Users are never edited, so
+#their newest id stands in for a timestamp.
+def table_state(model):
+  latest = model.updated_at if hasattr(model, 'updated_at') else model.id
+  return db.select(func.count(model.id), func.max(latest))
+
+#One check or build of an index runs at a time, under its build lock. Once an
+#index is built, requests that find its check already running go on with the
+#current index instead of waiting for a rebuild.
+build_locks = {}
+build_locks_lock = threading.Lock()
+
+def build_lock(index):
+  with build_locks_lock:
+    return build_locks.setdefault(id(index), threading.Lock())
+
+#Returns index, building it with rows() on first use and rebuilding it when
+#the state select returns a different stamp than at the last build
+def current_index(index, state, rows):
+  interval = current_app.config.get('INDEX_CHECK_INTERVAL', 5)
+  if index.built and time.time() - getattr(index, 'checked_at', 0) < interval:
+    return index
+  lock = build_lock(index)
+  if not lock.acquire(not index.built):
+    return index
+  try:
+    now = time.time()
+    if not index.built or now - getattr(index, 'checked_at', 0) >= interval:
+      stamp = tuple(db.session.execute(state).one())
+      if not index.built or stamp != getattr(index, 'stamp', None):
+        index.build(rows())
+        with index.lock:
+          index.stamp = stamp
+          index.state = state
+        if index not in built_indexes:
+          built_indexes.append(index)
+      index.checked_at = now
+  finally:
+    lock.release()
+  return index
+
+#Runs after the change handlers of a commit have updated the indexes. The
+#session cannot run queries after its commit, so the stamps are read on a
+#connection of their own. If that fails the old stamps stay and the indexes
+#are rebuilt at their next check.
+def refresh_index_stamps(tables):
+  tables = set(tables)
+  stamps = {}
+  try:
+    with db.engine.connect() as connection:
+      for index in built_indexes:
+        if any(table.name in tables for table in index.state.get_final_froms()):
+          key = str(index.state)
+          with index.lock:
+            if key not in stamps:
+              stamps[key] = tuple(connection.execute(index.state).one())
+            index.stamp = stamps[key]
+  except Exception:
+    current_app.logger.exception('could not refresh index stamps')
+
+table_change_handlers.append(refresh_index_stamps)
+
+
+#  Similar Vendors
+#  ----------------------------------------------------------------
+similarity_index = SimilarityIndex()
+
+#VendorVectors needs numpy, so it is imported and created on first use
+vendor_vectors = None
+vendor_vectors_lock = threading.Lock()
+
+#(id, category, cuisine, cost) for every vendor, the input the vendor indexes are built from
+def vendor_similarity_rows():
+  return db.session.query(Vendor.id, Vendor.category, Vendor.cuisine, Vendor.cost).all()
+
+#Returns the similarity index, built from the vendor table and kept current
+def get_similarity_index():
+  similarity_index.top_k = current_app.config.get('SIMILAR_VENDORS_TOP_K', 10)
+  return current_index(similarity_index, table_state(Vendor), vendor_similarity_rows)
+
+#Returns the one-hot vendor vectors, built from the vendor table and kept current
+def get_vendor_vectors():
+  global vendor_vectors
+  if vendor_vectors is None:
+    with vendor_vectors_lock:
+      if vendor_vectors is None:
+        from recommend import VendorVectors
+        vendor_vectors = VendorVectors()
+  return current_index(vendor_vectors, table_state(Vendor), vendor_similarity_rows)
+
+#keeps the similarity index and vendor vectors in step with committed vendor changes
+def update_similarity_index(changes):
+  for change in changes:
+    if change['action'] == 'delete':
+      similarity_index.remove(change['vendor_id'])
+      if vendor_vectors is not None:
+        vendor_vectors.remove(change['vendor_id'])
+    else:
+      attributes = (change['category'], change['cuisine'], change['cost'])
+      similarity_index.update(change['vendor_id'], attributes)
+      if vendor_vectors is not None:
+        vendor_vectors.update(change['vendor_id'], attributes)
+
+vendor_change_handlers.append(update_similarity_index)
+
+#turns ranked (vendor_id, count) pairs into records for the templates using one query
+def load_ranked_vendors(ranked):
+  if not ranked:
+    return []
+  vendors = loader_for(Vendor).load_many([vendor_id for vendor_id, count in ranked])
+  return [{"vendor": vendor, "count": count}
+    for (vendor_id, count), vendor in zip(ranked, vendors) if vendor is not None]
+
+#returns the vendors sharing the most of category, cuisine and cost with vendor_id
+def find_most_similar(vendor_id, limit=None):
+  ranked = get_similarity_index().neighbors(vendor_id, limit)
+  return load_ranked_vendors(ranked)
+
+#scores every vendor against the user's favorites in one matrix product
+def recommend_vendors_from_favorites(user_id, limit=None):
+  favorite_ids = [row.vendor_id for row in
+    db.session.query(favorites.c.vendor_id).filter(favorites.c.user_id == user_id)]
+  ranked = get_vendor_vectors().recommend(favorite_ids, limit)
+  return load_ranked_vendors(ranked)
+
+
+#  Co-preferred Vendors
+#  ----------------------------------------------------------------
+#yields (user_id, vendor_id) rows of a select in chunks without loading the whole result
+def stream_pairs(stmt, chunk_size):
+  result = db.session.execute(stmt.execution_options(yield_per=chunk_size))
+  for partition in result.partitions():
+    yield [tuple(row) for row in partition]
+
+#vendors most often liked by the same users as vendor_ids, excluding vendor_ids themselves
+def co_preferred_vendors(vendor_ids, limit=None):
+  if not vendor_ids:
+    return []
+  rows = db.session.query(VendorNeighbor.neighbor_id, VendorNeighbor.score).filter(
+    VendorNeighbor.vendor_id.in_(vendor_ids)).all()
+
+  scores = Counter()
+  for neighbor_id, score in rows:
+    if neighbor_id not in vendor_ids:
+      scores[neighbor_id] += score
+
+  ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+  return load_ranked_vendors(ranked[:limit])
+
+
+#  Name Search
+#  ----------------------------------------------------------------
+#With SEARCH_BACKEND = 'postgres' searches run against the pg_trgm GIN indexes
+#on Vendor.name and User.username; otherwise they use in-process trigram
+#indexes that work on any database.
+vendor_search_index = TrigramIndex()
+user_search_index = TrigramIndex()
+
+vendor_prefix_index = PrefixIndex()
+user_prefix_index = PrefixIndex()
+
+#Returns a search or prefix index over (id, name) rows of model, kept current
+def get_search_index(index, model, name_column):
+  return current_index(index, table_state(model), lambda: db.session.query(model.id, name_column).all())
+
+#ranks rows of (id, name) by pg_trgm word similarity to the term
+def trigram_query(id_column, name_column, term, limit):
+  pattern = '%{}%'.format(term)
+  word_similarity = func.word_similarity(term, name_column)
+  query = db.session.query(id_column, name_column).filter(
+    or_(name_column.ilike(pattern), name_column.op('%>')(term))
+  ).order_by(db.desc(word_similarity), db.desc(func.similarity(name_column, term)), name_column)
+  return [(row[0], row[1]) for row in query.limit(limit)]
+
+#runs term against an in-process trigram index with the app's match threshold
+def trigram_search(index, model, name_column, term, limit):
+  index = get_search_index(index, model, name_column)
+  index.threshold = current_app.config.get('SEARCH_THRESHOLD', 0.5)
+  return [(item_id, name) for item_id, name, score in index.search(term, limit)]
+
+#returns (id, name) pairs of the vendors best matching term
+def search_vendor_names(term):
+  limit = current_app.config.get('SEARCH_RESULTS_LIMIT', 50)
+  if current_app.config.get('SEARCH_BACKEND', 'python') == 'postgres':
+    return trigram_query(Vendor.id, Vendor.name, term, limit)
+  return trigram_search(vendor_search_index, Vendor, Vendor.name, term, limit)
+
+#returns (id, username) pairs of the users best matching term
+def search_usernames(term):
+  limit = current_app.config.get('SEARCH_RESULTS_LIMIT', 50)
+  if current_app.config.get('SEARCH_BACKEND', 'python') == 'postgres':
+    return trigram_query(User.id, User.username, term, limit)
+  return trigram_search(user_search_index, User, User.username, term, limit)
+
+def update_vendor_search_index(changes):
+  for change in changes:
+    if change['action'] == 'delete':
+      vendor_search_index.remove(change['vendor_id'])
+      vendor_prefix_index.remove(change['vendor_id'])
+    else:
+      vendor_search_index.update(change['vendor_id'], change['name'])
+      vendor_prefix_index.update(change['vendor_id'], change['name'])
+
+def update_user_search_index(changes):
+  for change in changes:
+    if change['action'] == 'delete':
+      user_search_index.remove(change['user_id'])
+      user_prefix_index.remove(change['user_id'])
+    else:
+      user_search_index.update(change['user_id'], change['username'])
+      user_prefix_index.update(change['user_id'], change['username'])
+
+vendor_change_handlers.append(update_vendor_search_index)
+user_change_handlers.append(update_user_search_index)
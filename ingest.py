@@ -0,0 +1,70 @@
+import csv
+import json
+from itertools import islice
+
+#Fields a purchase record may carry; user_id and menu_id are required
+PURCHASE_FIELDS = ('user_id', 'vendor_id', 'menu_id', 'quantity', 'reference')
+
+
+#Guesses the record format of a file from its name or a content type
+def detect_format(name):
+    name = (name or '').lower()
+    if name.endswith('.csv') or 'csv' in name:
+        return 'csv'
+    return 'jsonl'
+
+#Yields (line_number, record, error) for every record in a text stream of CSV
+#with a header row or of one JSON object per line, reading one line at a time
+def read_records(stream, fmt):
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield (reader.line_num, record, None)
+        return
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            yield (line_number, None, 'invalid JSON: {}'.format(error))
+            continue
+        if not isinstance(record, dict):
+            yield (line_number, None, 'expected a JSON object')
+            continue
+        yield (line_number, record, None)
+
+#Turns a raw purchase record into (user_id, vendor_id, menu_id, quantity, reference).
+#Raises ValueError with a readable message when the record is unusable.
+def parse_purchase(record):
+    def integer(field, required):
+        value = record.get(field)
+        if value is None or value == '':
+            if required:
+                raise ValueError('missing ' + field)
+            return None
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise ValueError('{} must be an integer'.format(field))
+
+    user_id = integer('user_id', True)
+    menu_id = integer('menu_id', True)
+    vendor_id = integer('vendor_id', False)
+    quantity = integer('quantity', False)
+    if quantity is None:
+        quantity = 1
+    if quantity < 1:
+        raise ValueError('quantity must be positive')
+    reference = record.get('reference') or None
+    return (user_id, vendor_id, menu_id, quantity, reference)
+
+#Yields lists of up to size items from iterable
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
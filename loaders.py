@@ -0,0 +1,53 @@
+#DataLoader-style batching for primary-key lookups.
+#Callers announce the keys they are going to need with want() or ask for many
+#at once with load_many(); every key not seen yet is then fetched with one
+#call to fetch(keys), which returns {key: object}. Results are remembered for
+#the life of the loader, which the app keeps to a single request, and hits and
+#misses count the lookups that were answered with and without a fetch.
+class BatchLoader(object):
+
+    def __init__(self, fetch):
+        self._fetch = fetch
+        self._cache = {}
+        self._pending = set()
+        self.hits = 0
+        self.misses = 0
+
+    #Queues keys to be fetched together with the next load
+    def want(self, keys):
+        for key in keys:
+            if key is not None and key not in self._cache:
+                self._pending.add(key)
+
+    def dispatch(self):
+        if not self._pending:
+            return
+        keys, self._pending = self._pending, set()
+        found = self._fetch(list(keys))
+        for key in keys:
+            self._cache[key] = found.get(key)
+
+    def load(self, key):
+        if key in self._cache:
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._pending.add(key)
+            self.dispatch()
+        return self._cache.get(key)
+
+    #Returns the objects for keys in order, None where a key does not exist
+    def load_many(self, keys):
+        keys = list(keys)
+        for key in keys:
+            if key in self._cache:
+                self.hits += 1
+            else:
+                self.misses += 1
+        self.want(keys)
+        self.dispatch()
+        return [self._cache.get(key) for key in keys]
+
+    #Stores objects that were already loaded some other way
+    def prime(self, key, value):
+        self._cache[key] = value
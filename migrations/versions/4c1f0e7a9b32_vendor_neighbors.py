@@ -0,0 +1,32 @@
+"""vendor neighbors
+
+Revision ID: 4c1f0e7a9b32
+Revises: eb84635c7bbd
+Create Date: 2026-10-18 10:12:41.208311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c1f0e7a9b32'
+down_revision = 'eb84635c7bbd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('vendor_neighbors',
+    sa.Column('vendor_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('neighbor_id', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['neighbor_id'], ['Vendor.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['vendor_id'], ['Vendor.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('vendor_id', 'rank')
+    )
+
+
+def downgrade():
+    op.drop_table('vendor_neighbors')
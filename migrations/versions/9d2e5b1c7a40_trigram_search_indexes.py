@@ -0,0 +1,28 @@
+"""trigram search indexes
+
+Revision ID: 9d2e5b1c7a40
+Revises: 4c1f0e7a9b32
+Create Date: 2026-10-18 11:03:17.554920
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9d2e5b1c7a40'
+down_revision = '4c1f0e7a9b32'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_Vendor_name_trgm', 'Vendor', ['name'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_User_username_trgm', 'User', ['username'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'username': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_User_username_trgm', table_name='User')
+    op.drop_index('ix_Vendor_name_trgm', table_name='Vendor')
@@ -0,0 +1,48 @@
+"""rewards unique user vendor
+
+Revision ID: b7a4c2d9e615
+Revises: 9d2e5b1c7a40
+Create Date: 2026-10-18 12:26:05.731842
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7a4c2d9e615'
+down_revision = '9d2e5b1c7a40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # give rewards.id its own sequence so it can be the primary key on its own
+    op.execute('CREATE SEQUENCE IF NOT EXISTS rewards_id_seq OWNED BY rewards.id')
+    op.execute("ALTER TABLE rewards ALTER COLUMN id SET DEFAULT nextval('rewards_id_seq')")
+    op.execute("SELECT setval('rewards_id_seq', COALESCE((SELECT MAX(id) FROM rewards), 0) + 1, false)")
+
+    # fold duplicate (user_id, vendor_id) rows into the oldest one
+    op.execute("""
+        UPDATE rewards SET points = totals.points
+        FROM (SELECT MIN(id) AS id, SUM(COALESCE(points, 0)) AS points
+              FROM rewards GROUP BY user_id, vendor_id HAVING COUNT(*) > 1) AS totals
+        WHERE rewards.id = totals.id
+    """)
+    op.execute("""
+        DELETE FROM rewards USING rewards AS kept
+        WHERE rewards.user_id = kept.user_id
+          AND rewards.vendor_id = kept.vendor_id
+          AND rewards.id > kept.id
+    """)
+
+    op.drop_constraint('rewards_pkey', 'rewards', type_='primary')
+    op.create_primary_key('rewards_pkey', 'rewards', ['id'])
+    op.create_unique_constraint('uq_rewards_user_vendor', 'rewards', ['user_id', 'vendor_id'])
+
+
+def downgrade():
+    op.drop_constraint('uq_rewards_user_vendor', 'rewards', type_='unique')
+    op.drop_constraint('rewards_pkey', 'rewards', type_='primary')
+    op.create_primary_key('rewards_pkey', 'rewards', ['id', 'user_id', 'vendor_id'])
+    op.execute('ALTER TABLE rewards ALTER COLUMN id DROP DEFAULT')
+    op.execute('DROP SEQUENCE IF EXISTS rewards_id_seq')
@@ -0,0 +1,44 @@
+"""points ledger
+
+Revision ID: c3e8f1a2b4d7
+Revises: b7a4c2d9e615
+Create Date: 2026-10-18 13:02:44.120583
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e8f1a2b4d7'
+down_revision = 'b7a4c2d9e615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('points_ledger',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('vendor_id', sa.Integer(), nullable=False),
+    sa.Column('delta', sa.Integer(), nullable=False),
+    sa.Column('reason', sa.String(length=20), nullable=False),
+    sa.Column('reference', sa.String(length=200), nullable=True),
+    sa.Column('deal_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('compacted', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['deal_id'], ['Deals.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['user_id'], ['User.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['vendor_id'], ['Vendor.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_points_ledger_compacted'), 'points_ledger', ['compacted'], unique=False)
+    # balance reads look up the un-compacted tail of one user
+    op.create_index('ix_points_ledger_user_tail', 'points_ledger', ['user_id', 'vendor_id'], unique=False,
+                    postgresql_where=sa.text('NOT compacted'))
+
+
+def downgrade():
+    op.drop_index('ix_points_ledger_user_tail', table_name='points_ledger')
+    op.drop_index(op.f('ix_points_ledger_compacted'), table_name='points_ledger')
+    op.drop_table('points_ledger')
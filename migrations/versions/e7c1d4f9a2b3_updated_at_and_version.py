@@ -0,0 +1,33 @@
+"""updated_at and version columns
+
+Revision ID: e7c1d4f9a2b3
+Revises: d5b9a0c6e2f8
+Create Date: 2026-10-18 16:02:37.418205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c1d4f9a2b3'
+down_revision = 'd5b9a0c6e2f8'
+branch_labels = None
+depends_on = None
+
+tables = ('Vendor', 'Menu', 'Deals', 'rewards')
+
+
+def upgrade():
+    for table in tables:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False))
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    # conditional GETs read the newest vendor change on every vendor and user page
+    op.create_index(op.f('ix_Vendor_updated_at'), 'Vendor', ['updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_Vendor_updated_at'), table_name='Vendor')
+    for table in reversed(tables):
+        op.drop_column(table, 'version')
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,102 @@
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import backref
+
+from extensions import db
+
+#Table that stores the vendors that each user marks as a favorite
+favorites = db.Table('favorites',
+    db.Column('user_id', db.Integer, db.ForeignKey('User.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('vendor_id', db.Integer, db.ForeignKey('Vendor.id', ondelete='CASCADE'), primary_key=True)
+    )
+
+#Attribute object to represent the points each user has with each vendor
+class rewards(db.Model):
+  __tablename__ = 'rewards'
+  __table_args__ = (db.UniqueConstraint('user_id', 'vendor_id', name='uq_rewards_user_vendor'),)
+  id = db.Column(db.Integer, primary_key=True)
+  user_id = db.Column(db.Integer, db.ForeignKey('User.id', ondelete='CASCADE'), nullable=False)
+  vendor_id = db.Column(db.Integer, db.ForeignKey('Vendor.id', ondelete='CASCADE'), nullable=False)
+  points = db.Column(db.Integer)
+  updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=func.now())
+  version = db.Column(db.Integer, nullable=False, default=1, onupdate=db.literal_column('version') + 1, server_default='1')
+
+  user = db.relation('User', back_populates ='vendors')
+  vendor = db.relationship('Vendor', back_populates='users')
+
+#Table for Vendor
+class Vendor(db.Model):
+    __tablename__ = 'Vendor'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100))
+    cost = db.Column(db.Integer)
+    purchase_to_points = db.Column(db.Integer)
+    category = db.Column(db.String(120))
+    cuisine = db.Column(db.String)
+    location = db.Column(db.String(200))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=func.now(), index=True)
+    version = db.Column(db.Integer, nullable=False, default=1, onupdate=db.literal_column('version') + 1, server_default='1')
+    offers = db.relationship('Deals', backref = 'vendor', lazy=True)
+    menuItems = db.relationship('Menu', backref = backref('vendor', uselist = False), lazy=True, cascade="all, delete", passive_deletes=True)
+    users = db.relationship('rewards', back_populates="vendor", cascade="all, delete",
+        passive_deletes=True)
+
+#Table for user
+class User(db.Model):
+    __tablename__ = 'User'
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String, unique = True)
+    favorites = db.relationship('Vendor', secondary=favorites, lazy='subquery', backref=db.backref('favUsers', lazy=True), cascade="all, delete", passive_deletes=True)
+    vendors = db.relationship('rewards',back_populates = "user", cascade="all, delete", passive_deletes=True)
+
+
+#Table for Deals
+class Deals(db.Model):
+    __tablename__ = 'Deals'
+    id = db.Column(db.Integer, primary_key = True)
+    item = db.Column(db.String)
+    price = db.Column(db.Integer)
+    points_required = db.Column(db.Integer)
+    vendor_id = db.Column(db.Integer, db.ForeignKey('Vendor.id'), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, onupdate=db.literal_column('version') + 1, server_default='1')
+
+#Tables for Menu
+class Menu(db.Model):
+    __tablename__ = 'Menu'
+    id = db.Column(db.Integer, primary_key = True)
+    item = db.Column(db.String(120), nullable = False)
+    price = db.Column(db.Integer)
+    vendor_id = db.Column(db.Integer, db.ForeignKey('Vendor.id', ondelete='CASCADE'), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, server_default=func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, onupdate=db.literal_column('version') + 1, server_default='1')
+
+#Append-only record of every points change. Rows are only ever inserted;
+#`flask compact-points-ledger` folds them into rewards and marks them compacted.
+class PointsLedger(db.Model):
+    __tablename__ = 'points_ledger'
+    id = db.Column(db.Integer, primary_key = True)
+    user_id = db.Column(db.Integer, db.ForeignKey('User.id', ondelete='CASCADE'), nullable=False)
+    vendor_id = db.Column(db.Integer, db.ForeignKey('Vendor.id', ondelete='CASCADE'), nullable=False)
+    delta = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(20), nullable=False)
+    reference = db.Column(db.String(200))
+    deal_id = db.Column(db.Integer, db.ForeignKey('Deals.id', ondelete='SET NULL'))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    compacted = db.Column(db.Boolean, nullable=False, default=False, index=True)
+
+#Keys of requests that were already applied, so a retried submission is a no-op
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    key = db.Column(db.String(64), primary_key = True)
+    scope = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+#Top vendors liked by the same users as vendor_id, rebuilt by `flask build-vendor-neighbors`
+class VendorNeighbor(db.Model):
+    __tablename__ = 'vendor_neighbors'
+    vendor_id = db.Column(db.Integer, db.ForeignKey('Vendor.id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)
+    neighbor_id = db.Column(db.Integer, db.ForeignKey('Vendor.id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Integer, nullable=False)
+
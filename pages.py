@@ -0,0 +1,179 @@
+import hashlib
+from datetime import timezone
+from functools import wraps
+from flask import Response, current_app, g, request, session
+from sqlalchemy import func, true
+
+from assets import asset_version
+from cache import MemoryCache, RedisCache, TaggedCache
+from entities import get_entity
+from events import cache_tag_handlers
+from extensions import db
+from models import rewards, Vendor, User, PointsLedger, VendorNeighbor
+
+#  Page Cache
+#  ----------------------------------------------------------------
+#Rendered pages are cached under their path and query string together with
+#tags naming the rows they show; committed changes to those rows invalidate
+#the tags. PAGE_CACHE_BACKEND is 'memory' for an LRU+TTL cache in each
+#process, 'redis' to share one cache between processes, or None to disable.
+#A memory cache never hears of the invalidations made by other processes, so
+#it is refused when the app runs in more than one worker.
+def make_page_cache(app):
+  backend = app.config.get('PAGE_CACHE_BACKEND', 'memory')
+  ttl = app.config.get('PAGE_CACHE_TTL', 300)
+  if backend == 'memory' and app.config.get('WORKERS', 1) > 1:
+    raise RuntimeError("PAGE_CACHE_BACKEND 'memory' is not shared between the {} WORKERS; use 'redis' or None".format(app.config['WORKERS']))
+  if backend == 'redis':
+    return TaggedCache(RedisCache.from_url(app.config.get('PAGE_CACHE_REDIS_URL', 'redis://localhost:6379/0'), default_ttl=ttl))
+  if backend == 'memory':
+    return TaggedCache(MemoryCache(app.config.get('PAGE_CACHE_MAX_ENTRIES', 1024), ttl))
+  return None
+
+#The page cache of the current app, or None when it is disabled
+def get_page_cache():
+  return current_app.extensions.get('page_cache')
+
+def invalidate_pages(tags):
+  page_cache = get_page_cache()
+  if page_cache is not None:
+    page_cache.invalidate(tags)
+
+cache_tag_handlers.append(invalidate_pages)
+
+#Serves a GET view from the page cache. tags(**view_args) lists the tags of
+#the data the page shows. Pages are rendered fresh while flashed messages are
+#waiting, so a message is never cached into a page or lost. Under
+#conditional_page the ETag is part of the key: a body cached by a process that
+#missed an invalidation is then never served under a newer ETag.
+def cached_page(tags):
+  def decorator(view):
+    @wraps(view)
+    def cached_view(**kwargs):
+      page_cache = get_page_cache()
+      if page_cache is None or '_flashes' in session:
+        return view(**kwargs)
+      rendered = {}
+      def render():
+        result = rendered["result"] = view(**kwargs)
+        return result if isinstance(result, str) else None
+      key = 'page:' + asset_version() + ':' + request.full_path
+      if g.get('page_etag'):
+        key += ':' + g.page_etag
+      body = page_cache.fetch(key, tags(**kwargs), render)
+      if body is None:
+        return rendered["result"]
+      response = current_app.make_response(body)
+      response.headers['X-Page-Cache'] = 'miss' if rendered else 'hit'
+      return response
+    return cached_view
+  return decorator
+
+
+#  Conditional GET
+#  ----------------------------------------------------------------
+#Answers a GET with 304 Not Modified before the view, the page cache or any
+#rendering runs, when the client's copy is still current.
+#validators(**view_args) reads the versions the page depends on with a few
+#cheap queries and returns (etag, last_modified), or None when the page cannot
+#be validated. If-None-Match wins over If-Modified-Since when both are sent.
+def conditional_page(validators):
+  def decorator(view):
+    @wraps(view)
+    def conditional_view(**kwargs):
+      if '_flashes' in session:
+        return view(**kwargs)
+      found = validators(**kwargs)
+      if found is None:
+        return view(**kwargs)
+      etag, last_modified = found
+      etag = g.page_etag = etag_for(etag, asset_version())
+      if last_modified is not None:
+        last_modified = last_modified.replace(microsecond=0, tzinfo=timezone.utc)
+      if request.if_none_match:
+        current = request.if_none_match.contains(etag)
+      else:
+        current = last_modified is not None and request.if_modified_since is not None and last_modified <= request.if_modified_since
+      if current:
+        response = Response(status=304)
+      else:
+        response = current_app.make_response(view(**kwargs))
+        if response.status_code != 200:
+          return response
+      response.set_etag(etag)
+      if last_modified is not None:
+        response.last_modified = last_modified
+      response.headers['Cache-Control'] = 'no-cache'
+      return response
+    return conditional_view
+  return decorator
+
+def etag_for(*parts):
+  return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+#The row count and newest change of the vendor table, which the similar
+#vendors and recommendations shown on a page are drawn from
+def vendor_table_state():
+  return db.select(func.count(Vendor.id), func.max(Vendor.updated_at))
+
+#A vendor page shows the vendor, its menu and deals, which all move its
+#version, and similar vendors. Last-Modified misses the deletion of another
+#vendor; clients that got an ETag revalidate with it and are always exact.
+def vendor_page_validators(vendor_id):
+  vendor_table = vendor_table_state().subquery()
+  row = db.session.query(Vendor.version, vendor_table).join(vendor_table, true()).filter(Vendor.id == vendor_id).first()
+  if row is None:
+    return None
+  version, vendor_count, latest = row
+  return etag_for('vendor', vendor_id, version, vendor_count, latest), latest
+
+#A user page shows the username, favorites, balances from rewards and the
+#ledger tail, and recommendations drawn from the vendor table and the vendor
+#neighbors of the favorites. Favorites carry no timestamp, so these pages are
+#validated by ETag only.
+def user_page_validators(user_id):
+  user = get_entity(User, user_id)
+  if user is None:
+    return None
+  favorite_ids = sorted(vendor.id for vendor in user.favorites)
+  reward_state = db.select(func.count(rewards.id), func.sum(rewards.version), func.max(rewards.updated_at)).where(
+    rewards.user_id == user_id).subquery()
+  ledger_state = db.select(func.count(PointsLedger.id), func.max(PointsLedger.id)).where(
+    PointsLedger.user_id == user_id, PointsLedger.compacted == False).subquery()
+  neighbor_state = db.select(func.count(VendorNeighbor.rank), func.sum(VendorNeighbor.neighbor_id), func.sum(VendorNeighbor.score)).where(
+    VendorNeighbor.vendor_id.in_(favorite_ids)).subquery()
+  vendor_state = vendor_table_state().subquery()
+  state = db.session.execute(db.select(reward_state, ledger_state, neighbor_state, vendor_state).select_from(
+    reward_state.join(ledger_state, true()).join(neighbor_state, true()).join(vendor_state, true()))).one()
+  return etag_for('user', user_id, user.username, favorite_ids, tuple(state)), None
+
+
+#  Pagination
+#  ----------------------------------------------------------------
+#List routes page on id, newest first. The token for the next page is the
+#last id shown, passed back as ?after=<id>, so a page is one indexed range
+#scan however deep it is and stays stable while rows are added.
+def page_size():
+  size = request.args.get('per_page', current_app.config.get('PAGE_SIZE', 50), type=int)
+  return max(1, min(size, current_app.config.get('MAX_PAGE_SIZE', 200)))
+
+#returns (rows, next_after) for one page of query ordered by id_column descending
+def keyset_page(query, id_column):
+  size = page_size()
+  after = request.args.get('after', type=int)
+  if after is not None:
+    query = query.filter(id_column < after)
+  rows = query.order_by(db.desc(id_column)).limit(size + 1).all()
+  if len(rows) > size:
+    return rows[:size], rows[size - 1].id
+  return rows, None
+
+#returns (ids, next_after) for one page of a list of ids sorted descending
+def keyset_page_ids(ids):
+  size = page_size()
+  after = request.args.get('after', type=int)
+  if after is not None:
+    ids = [item_id for item_id in ids if item_id < after]
+  if len(ids) > size:
+    return ids[:size], ids[size - 1]
+  return ids, None
@@ -0,0 +1,133 @@
+from datetime import datetime
+from sqlalchemy import func, union_all
+from sqlalchemy.exc import IntegrityError
+
+from entities import loader_for
+from events import record_cache_tags
+from extensions import db
+from models import rewards, Vendor, PointsLedger, IdempotencyKey
+
+#  Points Balances
+#  ----------------------------------------------------------------
+#Returns the INSERT ... ON CONFLICT capable insert() for the current database,
+#or None when the dialect has no upsert support
+def upsert_insert(table):
+  dialect = db.session.get_bind().dialect.name
+  if dialect == 'postgresql':
+    from sqlalchemy.dialects.postgresql import insert
+  elif dialect == 'sqlite':
+    from sqlalchemy.dialects.sqlite import insert
+  else:
+    return None
+  return insert(table)
+
+#Adds points to a user's balance with a vendor in a single statement:
+#INSERT ... ON CONFLICT (user_id, vendor_id) DO UPDATE on PostgreSQL and SQLite,
+#and an UPDATE followed by an INSERT when no row was updated elsewhere.
+def accrue_points(user_id, vendor_id, points):
+  table = rewards.__table__
+  insert = upsert_insert(table)
+  if insert is not None:
+    stmt = insert.values(user_id=user_id, vendor_id=vendor_id, points=points)
+    stmt = stmt.on_conflict_do_update(
+      index_elements=[table.c.user_id, table.c.vendor_id],
+      set_={
+        "points": func.coalesce(table.c.points, 0) + stmt.excluded.points,
+        "updated_at": datetime.utcnow(),
+        "version": table.c.version + 1
+      }
+    )
+    db.session.execute(stmt)
+    return
+
+  result = db.session.execute(table.update().where(
+    (table.c.user_id == user_id) & (table.c.vendor_id == vendor_id)
+  ).values(points=func.coalesce(table.c.points, 0) + points))
+  if result.rowcount == 0:
+    db.session.execute(table.insert().values(user_id=user_id, vendor_id=vendor_id, points=points))
+
+#Locks a user's balance with a vendor until the transaction ends, creating the
+#rewards row if needed, so redemptions of the same balance run one at a time
+def lock_points_balance(user_id, vendor_id):
+  accrue_points(user_id, vendor_id, 0)
+  db.session.query(rewards.id).filter(
+    rewards.user_id == user_id, rewards.vendor_id == vendor_id).with_for_update().first()
+
+#Stores an idempotency key in the current transaction. Returns False when the
+#key was already used, in which case the request must not be applied again.
+def claim_idempotency_key(key, scope):
+  table = IdempotencyKey.__table__
+  values = {"key": key, "scope": scope, "created_at": datetime.utcnow()}
+  insert = upsert_insert(table)
+  if insert is not None:
+    result = db.session.execute(insert.values(**values).on_conflict_do_nothing(index_elements=[table.c.key]))
+    return result.rowcount == 1
+  try:
+    with db.session.begin_nested():
+      db.session.execute(table.insert().values(**values))
+    return True
+  except IntegrityError:
+    return False
+
+#Appends a points change to the ledger. Nothing is read or locked, so tills
+#crediting the same balance never wait on each other.
+def record_points(user_id, vendor_id, delta, reason, reference=None, deal_id=None):
+  db.session.execute(PointsLedger.__table__.insert().values(
+    user_id=user_id,
+    vendor_id=vendor_id,
+    delta=delta,
+    reason=reason,
+    reference=reference,
+    deal_id=deal_id,
+    created_at=datetime.utcnow(),
+    compacted=False
+  ))
+  record_cache_tags('user:{}'.format(user_id))
+
+#Returns {vendor_id: points} for a user: the compacted balance in rewards plus
+#the ledger rows not compacted yet, read in one statement so a compaction
+#committing at the same time is never counted twice
+def points_balances(user_id, vendor_id=None):
+  stored = db.select(rewards.vendor_id.label('vendor_id'), func.coalesce(rewards.points, 0).label('points')).where(
+    rewards.user_id == user_id)
+  tail = db.select(PointsLedger.vendor_id, PointsLedger.delta).where(
+    PointsLedger.user_id == user_id, PointsLedger.compacted == False)
+  if vendor_id is not None:
+    stored = stored.where(rewards.vendor_id == vendor_id)
+    tail = tail.where(PointsLedger.vendor_id == vendor_id)
+  combined = union_all(stored, tail).subquery()
+  rows = db.session.execute(db.select(combined.c.vendor_id, func.sum(combined.c.points)).group_by(combined.c.vendor_id))
+  return dict((row[0], int(row[1] or 0)) for row in rows)
+
+def points_balance(user_id, vendor_id):
+  return points_balances(user_id, vendor_id).get(vendor_id, 0)
+
+#A select of (user_id, vendor_id, points) for every balance, combining rewards
+#and the uncompacted ledger rows the same way as points_balances
+def all_points_balances():
+  stored = db.select(rewards.user_id.label('user_id'), rewards.vendor_id.label('vendor_id'), func.coalesce(rewards.points, 0).label('points'))
+  tail = db.select(PointsLedger.user_id, PointsLedger.vendor_id, PointsLedger.delta).where(PointsLedger.compacted == False)
+  combined = union_all(stored, tail).subquery()
+  return db.select(combined.c.user_id, combined.c.vendor_id, func.sum(combined.c.points).label('points')).group_by(
+    combined.c.user_id, combined.c.vendor_id).order_by(combined.c.user_id, combined.c.vendor_id)
+
+
+#  Rewards Shown On User Pages
+#  ----------------------------------------------------------------
+#Display the rewards the user has with each vendor, loading the vendors in one query
+def show_rewards(balances):
+  vendor_ids = sorted(balances)
+  vendors = loader_for(Vendor).load_many(vendor_ids)
+
+  reward_info = []
+  for vendor_id, vendor in zip(vendor_ids, vendors):
+    if vendor is None:
+      continue
+    info = {
+      "vendor": vendor.name, 
+      "points": balances[vendor_id]
+    }
+    reward_info.append(info)
+    
+  
+  return reward_info
@@ -0,0 +1,135 @@
+import itertools
+import threading
+
+#The values each question in forms/quiz.html can be answered with
+QUIZ_QUESTIONS = (
+    ('hungry', (1, 2, 3, 4)),
+    ('time', (1, 2, 3)),
+    ('hour', (1, 2, 3)),
+    ('company', (1, 2, 3)),
+    ('budget', (1, 2, 3)),
+)
+
+
+#Each rule returns whether a vendor with the given category, cuisine and cost
+#suits one answer to one question
+def hunger_match(hunger_level, category, cuisine, cost):
+    if hunger_level <= 2:
+        return cuisine in ('Thai', 'Vegetarian', 'Chinese', 'Greek')
+    return cuisine in ('Italian', 'American', 'Indian')
+
+def time_match(time, category, cuisine, cost):
+    if time == 1:
+        return category == 'Sit-down'
+    if time == 2:
+        return category == 'Counter'
+    return category == 'Drive-thru'
+
+def hour_match(hour, category, cuisine, cost):
+    if hour == 2:
+        return category == 'Counter' or cost == 1
+    if hour == 3:
+        return category == 'Drive-thru'
+    return False
+
+def company_match(company, category, cuisine, cost):
+    if company == 1:
+        return category in ('Counter', 'Drive-thru')
+    if company == 2:
+        return category == 'Sit-down' and cost in (1, 2)
+    if company == 3:
+        return category == 'Counter'
+    return False
+
+def budget_match(budget, category, cuisine, cost):
+    if budget == 1:
+        return cost == 1
+    if budget == 2:
+        return cost in (1, 2)
+    return cost in (3, 4)
+
+QUIZ_RULES = (hunger_match, time_match, hour_match, company_match, budget_match)
+
+
+#Precomputed winner for every combination of quiz answers.
+#Vendors are grouped by their (category, cuisine, cost) signature, so building
+#the table only scores the few distinct signatures, and a submission is a
+#single dictionary lookup. The vendor matching the most answers wins; ties go
+#to the lowest vendor id.
+class QuizAnswerTable(object):
+
+    def __init__(self):
+        self.built = False
+        self.lock = threading.RLock()
+        self._signatures = {}
+        self._vendors = {}
+        self._answers = {}
+
+    #Replaces the table with rows of (vendor_id, category, cuisine, cost)
+    def build(self, rows):
+        with self.lock:
+            self._signatures = {}
+            self._vendors = {}
+            for row in rows:
+                self._add(row[0], tuple(row[1:]))
+            self._compute()
+            self.built = True
+
+    def update(self, vendor_id, attributes):
+        self.apply([(vendor_id, attributes)])
+
+    def remove(self, vendor_id):
+        self.apply([(vendor_id, None)])
+
+    #Applies (vendor_id, attributes) changes together, attributes being None for
+    #a removed vendor. The answers are only computed again, once, when the
+    #candidates changed: a signature gained its first or lost its last vendor,
+    #or its lowest vendor id moved.
+    def apply(self, changes):
+        with self.lock:
+            if not self.built:
+                return
+            before = self._candidates()
+            for vendor_id, attributes in changes:
+                self._discard(vendor_id)
+                if attributes is not None:
+                    self._add(vendor_id, tuple(attributes))
+            if self._candidates() != before:
+                self._compute()
+
+    #Returns the winning vendor id for a tuple of answers, or None
+    def lookup(self, answers):
+        return self._answers.get(tuple(answers))
+
+    def _add(self, vendor_id, signature):
+        self._vendors[vendor_id] = signature
+        self._signatures.setdefault(signature, set()).add(vendor_id)
+
+    def _discard(self, vendor_id):
+        signature = self._vendors.pop(vendor_id, None)
+        if signature is None:
+            return
+        members = self._signatures[signature]
+        members.discard(vendor_id)
+        if not members:
+            del self._signatures[signature]
+
+    #(lowest vendor id, signature) of every signature group, in scoring order
+    def _candidates(self):
+        return sorted((min(members), signature) for signature, members in self._signatures.items())
+
+    def _compute(self):
+        candidates = self._candidates()
+        answers = {}
+        for combination in itertools.product(*[values for name, values in QUIZ_QUESTIONS]):
+            best_id, best_count = None, 0
+            for vendor_id, signature in candidates:
+                count = 0
+                for rule, answer in zip(QUIZ_RULES, combination):
+                    if rule(answer, *signature):
+                        count += 1
+                if count > best_count:
+                    best_id, best_count = vendor_id, count
+            if best_id is not None:
+                answers[combination] = best_id
+        self._answers = answers
@@ -0,0 +1,85 @@
+import threading
+
+import numpy as np
+
+from similarity import SIMILARITY_FIELDS
+
+
+#One-hot attribute vectors for every vendor, one column per category, cuisine
+#and cost value. The dot product of two rows is the number of attributes the
+#vendors share, so a user's favorites can be scored against every vendor with
+#a single matrix-vector product.
+class VendorVectors(object):
+
+    def __init__(self):
+        self.built = False
+        self.lock = threading.RLock()
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self._rows = {}
+        self._columns = {}
+
+    #Replaces the matrix with rows of (vendor_id, category, cuisine, cost)
+    def build(self, rows):
+        rows = list(rows)
+        columns = {}
+        for row in rows:
+            for key in self._keys(row[1:]):
+                columns.setdefault(key, len(columns))
+
+        matrix = np.zeros((len(rows), len(columns)), dtype=np.float32)
+        for position, row in enumerate(rows):
+            for key in self._keys(row[1:]):
+                matrix[position, columns[key]] = 1
+
+        with self.lock:
+            self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+            self.matrix = matrix
+            self._rows = dict((vendor_id, position) for position, vendor_id in enumerate(self.ids.tolist()))
+            self._columns = columns
+            self.built = True
+
+    def _keys(self, attributes):
+        return [(field, value) for field, value in zip(SIMILARITY_FIELDS, attributes) if value is not None]
+
+    #Rewrites the vector of one vendor. A new vendor or an attribute value that
+    #has no column yet leaves the matrix unbuilt so the next read rebuilds it
+    #once, instead of copying the whole matrix to grow it for every insert.
+    def update(self, vendor_id, attributes):
+        with self.lock:
+            if not self.built:
+                return
+            keys = self._keys(attributes)
+            position = self._rows.get(vendor_id)
+            if position is None or any(key not in self._columns for key in keys):
+                self.built = False
+                return
+            self.matrix[position] = 0
+            for key in keys:
+                self.matrix[position, self._columns[key]] = 1
+
+    #Zeroes the vector of a deleted vendor so it can never score above zero
+    def remove(self, vendor_id):
+        with self.lock:
+            position = self._rows.pop(vendor_id, None)
+            if position is not None:
+                self.matrix[position] = 0
+
+    #Returns up to k (vendor_id, score) pairs for the vendors most similar to the
+    #favorites, highest score first, never including a favorite itself
+    def recommend(self, favorite_ids, k=None):
+        with self.lock:
+            positions = [self._rows[vendor_id] for vendor_id in favorite_ids if vendor_id in self._rows]
+            if not positions:
+                return []
+            profile = self.matrix[positions].sum(axis=0)
+            scores = self.matrix.dot(profile)
+            scores[positions] = 0
+            ids = self.ids
+
+        candidates = np.flatnonzero(scores > 0)
+        if k is not None and len(candidates) > k:
+            cutoff = np.partition(scores[candidates], len(candidates) - k)[len(candidates) - k]
+            candidates = candidates[scores[candidates] >= cutoff]
+        order = np.lexsort((ids[candidates], -scores[candidates]))[:k]
+        return [(int(ids[candidates[i]]), int(scores[candidates[i]])) for i in order]
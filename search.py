@@ -0,0 +1,171 @@
+import bisect
+import re
+import threading
+from collections import Counter
+
+WORD = re.compile(r'[^\W_]+')
+
+
+#Trigrams of every word in text the way pg_trgm pads them: two spaces before
+#and one after each lower-cased word
+def padded_trigrams(text):
+    grams = set()
+    for word in WORD.findall((text or '').lower()):
+        padded = '  ' + word + ' '
+        for start in range(len(padded) - 2):
+            grams.add(padded[start:start + 3])
+    return grams
+
+#Trigrams of a search term. Words of three or more letters are left unpadded so
+#a term that is a substring of a name shares every one of its trigrams with it.
+def term_trigrams(term):
+    grams = set()
+    for word in WORD.findall((term or '').lower()):
+        if len(word) < 3:
+            word = '  ' + word + ' '
+        for start in range(len(word) - 2):
+            grams.add(word[start:start + 3])
+    return grams
+
+
+#In-process trigram index over short texts such as vendor names and usernames.
+#A text matches when enough of the term's trigrams appear in it, which keeps
+#substring matches and tolerates typos; results are ranked by that share and
+#then by trigram similarity to the whole text.
+class TrigramIndex(object):
+
+    def __init__(self, threshold=0.5):
+        self.threshold = threshold
+        self.built = False
+        self.lock = threading.RLock()
+        self._postings = {}
+        self._texts = {}
+        self._sizes = {}
+
+    #Replaces the index with rows of (id, text)
+    def build(self, rows):
+        with self.lock:
+            self._postings = {}
+            self._texts = {}
+            self._sizes = {}
+            for item_id, text in rows:
+                self._add(item_id, text)
+            self.built = True
+
+    def update(self, item_id, text):
+        with self.lock:
+            if not self.built or (item_id in self._texts and self._texts[item_id] == text):
+                return
+            self._discard(item_id)
+            self._add(item_id, text)
+
+    def remove(self, item_id):
+        with self.lock:
+            if self.built:
+                self._discard(item_id)
+
+    def _add(self, item_id, text):
+        grams = padded_trigrams(text)
+        self._texts[item_id] = text
+        self._sizes[item_id] = len(grams)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(item_id)
+
+    def _discard(self, item_id):
+        text = self._texts.pop(item_id, None)
+        if text is None:
+            return
+        del self._sizes[item_id]
+        for gram in padded_trigrams(text):
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(item_id)
+                if not postings:
+                    del self._postings[gram]
+
+    #Returns up to limit (id, text, score) matches for term, best first
+    def search(self, term, limit=None):
+        grams = term_trigrams(term)
+        if not grams:
+            return []
+        with self.lock:
+            shared = Counter()
+            for gram in grams:
+                shared.update(self._postings.get(gram, ()))
+            matches = []
+            for item_id, count in shared.items():
+                score = count / float(len(grams))
+                if score >= self.threshold:
+                    similarity = count / float(len(grams) + self._sizes[item_id] - count)
+                    matches.append((score, similarity, self._texts[item_id], item_id))
+        matches.sort(key=lambda match: (-match[0], -match[1], match[2] or '', match[3]))
+        return [(item_id, text, score) for score, similarity, text, item_id in matches[:limit]]
+
+
+#Sorted array of lower-cased name suffixes starting at each word, for typeahead.
+#A prefix lookup is a binary search followed by a short scan, and inserts and
+#deletes keep the array sorted in place.
+class PrefixIndex(object):
+
+    def __init__(self):
+        self.built = False
+        self.lock = threading.RLock()
+        self._keys = []
+        self._names = {}
+
+    #Replaces the index with rows of (id, name)
+    def build(self, rows):
+        with self.lock:
+            self._names = {}
+            keys = []
+            for item_id, name in rows:
+                self._names[item_id] = name
+                keys.extend(self._entries(item_id, name))
+            keys.sort()
+            self._keys = keys
+            self.built = True
+
+    def _entries(self, item_id, name):
+        lowered = (name or '').lower()
+        return [(lowered[match.start():], item_id) for match in WORD.finditer(lowered)]
+
+    def update(self, item_id, name):
+        with self.lock:
+            if not self.built or (item_id in self._names and self._names[item_id] == name):
+                return
+            self._discard(item_id)
+            self._names[item_id] = name
+            for entry in self._entries(item_id, name):
+                bisect.insort(self._keys, entry)
+
+    def remove(self, item_id):
+        with self.lock:
+            if self.built:
+                self._discard(item_id)
+
+    def _discard(self, item_id):
+        if item_id not in self._names:
+            return
+        for entry in self._entries(item_id, self._names.pop(item_id)):
+            position = bisect.bisect_left(self._keys, entry)
+            if position < len(self._keys) and self._keys[position] == entry:
+                del self._keys[position]
+
+    #Returns up to limit (id, name) pairs with a word starting with prefix
+    def complete(self, prefix, limit=10):
+        prefix = (prefix or '').strip().lower()
+        if not prefix:
+            return []
+        found = []
+        seen = set()
+        with self.lock:
+            position = bisect.bisect_left(self._keys, (prefix,))
+            while position < len(self._keys) and len(found) < limit:
+                key, item_id = self._keys[position]
+                if not key.startswith(prefix):
+                    break
+                if item_id not in seen:
+                    seen.add(item_id)
+                    found.append((item_id, self._names[item_id]))
+                position += 1
+        return found
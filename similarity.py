@@ -0,0 +1,173 @@
+import heapq
+import threading
+from collections import Counter, defaultdict
+from itertools import combinations
+
+#Vendor attributes that similarity is based on, in the order rows are given
+SIMILARITY_FIELDS = ('category', 'cuisine', 'cost')
+
+
+#In-memory index of the most similar vendors for every vendor.
+#Vendors are grouped into one bucket per category, cuisine and cost value and
+#the top-K neighbors of each vendor are precomputed from those buckets, so a
+#lookup only has to slice a list that is already sorted.
+class SimilarityIndex(object):
+
+    def __init__(self, top_k=10):
+        self.top_k = top_k
+        self.built = False
+        self.lock = threading.RLock()
+        self._attributes = {}
+        self._buckets = {}
+        self._neighbors = {}
+        self._dirty = set()
+        self._pending = None
+
+    #Replaces the whole index with rows of (vendor_id, category, cuisine, cost).
+    #The new index is put together without holding the lock, so lookups and
+    #changes go on meanwhile, and is swapped in at the end. Changes made while
+    #it was being built are applied to it again after the swap.
+    def build(self, rows):
+        with self.lock:
+            self._pending = []
+        attributes = {}
+        buckets = dict((field, defaultdict(set)) for field in SIMILARITY_FIELDS)
+        for row in rows:
+            vendor_id, vendor_attributes = row[0], tuple(row[1:])
+            attributes[vendor_id] = vendor_attributes
+            for field, value in zip(SIMILARITY_FIELDS, vendor_attributes):
+                if value is not None:
+                    buckets[field][value].add(vendor_id)
+        neighbors = self._rank_all(attributes)
+
+        with self.lock:
+            self._attributes = attributes
+            self._buckets = buckets
+            self._neighbors = neighbors
+            self._dirty = set()
+            self.built = True
+            pending, self._pending = self._pending, None
+            for vendor_id, vendor_attributes in pending:
+                if vendor_attributes is None:
+                    self.remove(vendor_id)
+                else:
+                    self.update(vendor_id, vendor_attributes)
+
+    #Ranks every vendor at once. Vendors with the same attributes share one
+    #ranking, which is read level by level, most shared attributes first, from
+    #id-sorted groups of the vendors sharing each combination of values. Only
+    #top_k + 1 entries of a ranking are ever read, so the build grows with the
+    #number of vendors and not with the size of their buckets.
+    def _rank_all(self, attributes):
+        groups = defaultdict(list)
+        for vendor_id, vendor_attributes in attributes.items():
+            present = self._present(vendor_attributes)
+            for size in range(1, len(present) + 1):
+                for key in combinations(present, size):
+                    groups[key].append(vendor_id)
+        for members in groups.values():
+            members.sort()
+
+        rankings = {}
+        neighbors = {}
+        for vendor_id, vendor_attributes in attributes.items():
+            ranked = rankings.get(vendor_attributes)
+            if ranked is None:
+                ranked = rankings[vendor_attributes] = self._rank_attributes(vendor_attributes, attributes, groups)
+            neighbors[vendor_id] = [item for item in ranked if item[0] != vendor_id][:self.top_k]
+        return neighbors
+
+    #The first top_k + 1 (vendor_id, count) pairs for a vendor with these
+    #attributes, itself included. A vendor sharing exactly `shared` values
+    #is in exactly one group of that size, and vendors sharing more are skipped.
+    def _rank_attributes(self, vendor_attributes, attributes, groups):
+        present = self._present(vendor_attributes)
+        wanted = self.top_k + 1
+        ranked = []
+        for shared in range(len(present), 0, -1):
+            level = heapq.merge(*[groups[key] for key in combinations(present, shared)])
+            for other_id in level:
+                if self._shared(vendor_attributes, attributes[other_id]) == shared:
+                    ranked.append((other_id, shared))
+                    if len(ranked) == wanted:
+                        return ranked
+        return ranked
+
+    @staticmethod
+    def _present(vendor_attributes):
+        return tuple((position, value) for position, value in enumerate(vendor_attributes) if value is not None)
+
+    @staticmethod
+    def _shared(first, second):
+        return sum(1 for a, b in zip(first, second) if a is not None and a == b)
+
+    #Counts the shared attributes between vendor_id and every vendor in its buckets
+    def _rank(self, vendor_id):
+        counts = Counter()
+        for field, value in zip(SIMILARITY_FIELDS, self._attributes[vendor_id]):
+            if value is not None:
+                counts.update(self._buckets[field][value])
+        del counts[vendor_id]
+        return heapq.nsmallest(self.top_k, counts.items(), key=lambda item: (-item[1], item[0]))
+
+    #Adds or moves a vendor. Only the vendors sharing its old or new buckets are
+    #affected; they are marked dirty and re-ranked the next time they are read.
+    def update(self, vendor_id, attributes):
+        attributes = tuple(attributes)
+        with self.lock:
+            if self._pending is not None:
+                self._pending.append((vendor_id, attributes))
+            if not self.built or self._attributes.get(vendor_id) == attributes:
+                return
+            affected = self._unbucket(vendor_id)
+            self._attributes[vendor_id] = attributes
+            for field, value in zip(SIMILARITY_FIELDS, attributes):
+                if value is not None:
+                    bucket = self._buckets[field][value]
+                    affected.update(bucket)
+                    bucket.add(vendor_id)
+            affected.discard(vendor_id)
+            self._dirty.update(affected)
+            self._dirty.discard(vendor_id)
+            self._neighbors[vendor_id] = self._rank(vendor_id)
+
+    #Drops a vendor and marks the vendors that shared a bucket with it as dirty
+    def remove(self, vendor_id):
+        with self.lock:
+            if self._pending is not None:
+                self._pending.append((vendor_id, None))
+            if not self.built or vendor_id not in self._attributes:
+                return
+            affected = self._unbucket(vendor_id)
+            del self._attributes[vendor_id]
+            self._neighbors.pop(vendor_id, None)
+            self._dirty.discard(vendor_id)
+            self._dirty.update(affected)
+
+    #Takes vendor_id out of its current buckets and returns the other members
+    def _unbucket(self, vendor_id):
+        affected = set()
+        old_attributes = self._attributes.get(vendor_id)
+        if old_attributes is None:
+            return affected
+        for field, value in zip(SIMILARITY_FIELDS, old_attributes):
+            if value is None:
+                continue
+            bucket = self._buckets[field][value]
+            bucket.discard(vendor_id)
+            affected.update(bucket)
+            if not bucket:
+                del self._buckets[field][value]
+        return affected
+
+    #Returns up to k (vendor_id, count) pairs, most similar first
+    def neighbors(self, vendor_id, k=None):
+        if vendor_id in self._dirty:
+            with self.lock:
+                if vendor_id in self._dirty:
+                    self._neighbors[vendor_id] = self._rank(vendor_id)
+                    self._dirty.discard(vendor_id)
+        ranked = self._neighbors.get(vendor_id, [])
+        if k is None:
+            return list(ranked)
+        return ranked[:k]
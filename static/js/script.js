@@ -2,3 +2,30 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// Suggest vendor or user names from /api/autocomplete while typing in a
+// search box marked with data-autocomplete="vendors" or "users".
+document.addEventListener('DOMContentLoaded', function() {
+  var inputs = document.querySelectorAll('input[data-autocomplete]');
+  Array.prototype.forEach.call(inputs, function(input) {
+    var list = document.getElementById(input.getAttribute('list'));
+    var pending = null;
+    input.addEventListener('input', function() {
+      var prefix = input.value;
+      if (pending) { clearTimeout(pending); }
+      if (!prefix) { list.innerHTML = ''; return; }
+      pending = setTimeout(function() {
+        fetch('/api/autocomplete?q=' + encodeURIComponent(prefix))
+          .then(function(response) { return response.json(); })
+          .then(function(data) {
+            list.innerHTML = '';
+            data[input.getAttribute('data-autocomplete')].forEach(function(item) {
+              var option = document.createElement('option');
+              option.value = item.name;
+              list.appendChild(option);
+            });
+          });
+      }, 100);
+    });
+  });
+});
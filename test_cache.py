@@ -0,0 +1,130 @@
+import time
+import unittest
+from types import SimpleNamespace
+
+from cache import MemoryCache, RedisCache, TaggedCache
+from pages import make_page_cache
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+class MemoryCacheTest(unittest.TestCase):
+
+    def test_entries_expire_after_their_ttl(self):
+        cache = MemoryCache(default_ttl=0.01)
+        cache.set('short', 1)
+        cache.set('kept', 2, ttl=0)
+        time.sleep(0.03)
+        self.assertIsNone(cache.get('short'))
+        self.assertEqual(cache.get('kept'), 2)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = MemoryCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), [1, None, 3])
+
+    def test_add_only_stores_missing_or_expired_keys(self):
+        cache = MemoryCache()
+        self.assertTrue(cache.add('key', 1))
+        self.assertFalse(cache.add('key', 2))
+        cache.set('old', 1, ttl=0.01)
+        time.sleep(0.03)
+        self.assertTrue(cache.add('old', 2))
+        self.assertEqual(cache.get_many(['key', 'old']), [1, 2])
+
+
+class TaggedCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.backend = MemoryCache()
+        self.cache = TaggedCache(self.backend)
+        self.computed = []
+
+    def fetch(self, key, tags, value='value', **kwargs):
+        def compute():
+            self.computed.append(key)
+            return value
+        return self.cache.fetch(key, tags, compute, **kwargs)
+
+    def test_hit_until_a_tag_is_invalidated(self):
+        self.assertEqual(self.fetch('page', ['vendors', 'vendor:1']), 'value')
+        self.assertEqual(self.fetch('page', ['vendor:1', 'vendors']), 'value')
+        self.assertEqual(self.computed, ['page'])
+        self.cache.invalidate(['vendor:1'])
+        self.fetch('page', ['vendors', 'vendor:1'])
+        self.assertEqual(self.computed, ['page', 'page'])
+        self.assertEqual(self.cache.stats, {"hits": 1, "misses": 2, "invalidations": 1})
+
+    def test_invalidation_only_drops_entries_carrying_the_tag(self):
+        self.fetch('one', ['vendor:1'])
+        self.fetch('two', ['vendor:2'])
+        self.cache.invalidate(['vendor:1'])
+        self.fetch('one', ['vendor:1'])
+        self.fetch('two', ['vendor:2'])
+        self.assertEqual(self.computed, ['one', 'two', 'one'])
+
+    def test_none_is_returned_but_not_stored(self):
+        self.assertIsNone(self.fetch('page', ['vendors'], value=None))
+        self.assertIsNone(self.fetch('page', ['vendors'], value=None))
+        self.assertEqual(self.computed, ['page', 'page'])
+
+    def test_lost_tag_version_misses_instead_of_serving_stale(self):
+        self.fetch('page', ['vendors'])
+        self.backend.delete('tag:vendors')
+        self.fetch('page', ['vendors'])
+        self.assertEqual(self.computed, ['page', 'page'])
+
+    def test_value_read_before_an_invalidation_is_not_served_after_it(self):
+        def compute():
+            self.computed.append('page')
+            self.cache.invalidate(['vendors'])
+            return 'old'
+        self.cache.fetch('page', ['vendors'], compute)
+        self.assertEqual(self.fetch('page', ['vendors'], value='new'), 'new')
+
+    def test_entries_expire_after_their_ttl(self):
+        self.fetch('page', ['vendors'], ttl=0.01)
+        time.sleep(0.03)
+        self.fetch('page', ['vendors'])
+        self.assertEqual(self.computed, ['page', 'page'])
+
+    @unittest.skipIf(fakeredis is None, 'fakeredis is not installed')
+    def test_redis_invalidation_reaches_every_process(self):
+        server = fakeredis.FakeServer()
+        first = TaggedCache(RedisCache(fakeredis.FakeRedis(server=server)))
+        second = TaggedCache(RedisCache(fakeredis.FakeRedis(server=server)))
+        first.fetch('page', ['vendors'], lambda: 'old')
+        self.assertEqual(second.fetch('page', ['vendors'], lambda: 'unused'), 'old')
+        first.invalidate(['vendors'])
+        self.assertEqual(second.fetch('page', ['vendors'], lambda: 'new'), 'new')
+
+
+class MakePageCacheTest(unittest.TestCase):
+
+    def make(self, **config):
+        return make_page_cache(SimpleNamespace(config=config))
+
+    def test_memory_backend_in_one_worker(self):
+        page_cache = self.make(PAGE_CACHE_BACKEND='memory', PAGE_CACHE_MAX_ENTRIES=5)
+        self.assertIsInstance(page_cache.backend, MemoryCache)
+        self.assertEqual(page_cache.backend.max_entries, 5)
+
+    def test_memory_backend_is_refused_with_several_workers(self):
+        with self.assertRaises(RuntimeError):
+            self.make(PAGE_CACHE_BACKEND='memory', WORKERS=4)
+        self.assertIsNone(self.make(PAGE_CACHE_BACKEND=None, WORKERS=4))
+
+    @unittest.skipIf(fakeredis is None, 'fakeredis is not installed')
+    def test_redis_backend_with_several_workers(self):
+        page_cache = self.make(PAGE_CACHE_BACKEND='redis', PAGE_CACHE_REDIS_URL='fakeredis://', WORKERS=4)
+        self.assertIsInstance(page_cache.backend, RedisCache)
+
+
+if __name__ == '__main__':
+    unittest.main()
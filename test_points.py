@@ -0,0 +1,175 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from app import create_app
+from extensions import db
+from models import rewards, Vendor, User, Deals, PointsLedger
+from points import accrue_points, all_points_balances, claim_idempotency_key, points_balance, points_balances, record_points
+
+
+class TestConfig(object):
+    SECRET_KEY = 'test'
+    DEBUG = True
+    WTF_CSRF_ENABLED = False
+    PAGE_CACHE_BACKEND = None
+    TEMPLATE_CACHE_DIR = None
+    TEMPLATE_WARMUP = False
+
+
+class PointsTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        TestConfig.SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(cls.directory, 'points.db')
+        cls.app = create_app(TestConfig)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.directory, True)
+
+    def setUp(self):
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        vendor = Vendor(name='Taco Palace', category='Counter', cuisine='Mexican', cost=1, purchase_to_points=2, location='x')
+        user = User(username='ana')
+        db.session.add_all([vendor, user])
+        db.session.flush()
+        deal = Deals(item='Free taco', price=3, points_required=10, vendor_id=vendor.id)
+        db.session.add(deal)
+        db.session.commit()
+        self.vendor_id, self.user_id, self.deal_id = vendor.id, user.id, deal.id
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.context.pop()
+
+    def ledger(self):
+        return db.session.query(PointsLedger.delta, PointsLedger.reason, PointsLedger.compacted).order_by(PointsLedger.id).all()
+
+    def stored_points(self):
+        return db.session.query(rewards.points).filter(rewards.user_id == self.user_id, rewards.vendor_id == self.vendor_id).scalar()
+
+    def flashes(self):
+        with self.client.session_transaction() as session:
+            return [message for category, message in session.pop('_flashes', [])]
+
+    #Posts outside the test's app context, as a request of its own
+    def post(self, url, **kwargs):
+        self.context.pop()
+        try:
+            return self.client.post(url, **kwargs)
+        finally:
+            self.context = self.app.app_context()
+            self.context.push()
+
+    def redeem(self, vendor_id=None, headers=None, **extra):
+        data = {'user': str(self.user_id), 'item': str(self.deal_id), 'purchase_type': 'points'}
+        data.update(extra)
+        return self.post('/vendors/{}/purchase_deal_info'.format(vendor_id or self.vendor_id), data=data, headers=headers)
+
+
+class BalanceTest(PointsTestCase):
+
+    def test_balance_is_compacted_points_plus_ledger_tail(self):
+        accrue_points(self.user_id, self.vendor_id, 100)
+        record_points(self.user_id, self.vendor_id, 20, 'purchase')
+        record_points(self.user_id, self.vendor_id, -5, 'deal')
+        db.session.commit()
+        self.assertEqual(self.stored_points(), 100)
+        self.assertEqual(points_balances(self.user_id), {self.vendor_id: 115})
+
+        result = self.app.test_cli_runner().invoke(args=['compact-points-ledger'])
+        self.assertIsNone(result.exception, result.output)
+        self.assertEqual(self.stored_points(), 115)
+        self.assertEqual([compacted for delta, reason, compacted in self.ledger()], [True, True])
+        self.assertEqual(points_balance(self.user_id, self.vendor_id), 115)
+
+        record_points(self.user_id, self.vendor_id, -15, 'deal')
+        db.session.commit()
+        self.assertEqual(points_balance(self.user_id, self.vendor_id), 100)
+        self.assertEqual(db.session.execute(all_points_balances()).all(), [(self.user_id, self.vendor_id, 100)])
+
+    def test_accrue_points_keeps_one_row_per_balance(self):
+        accrue_points(self.user_id, self.vendor_id, 7)
+        accrue_points(self.user_id, self.vendor_id, 5)
+        accrue_points(self.user_id, self.vendor_id, 0)
+        db.session.commit()
+        self.assertEqual(db.session.query(rewards).count(), 1)
+        self.assertEqual(self.stored_points(), 12)
+
+    def test_balance_without_rewards_row_comes_from_the_ledger(self):
+        record_points(self.user_id, self.vendor_id, 8, 'purchase')
+        db.session.commit()
+        self.assertEqual(points_balances(self.user_id), {self.vendor_id: 8})
+        self.assertEqual(points_balance(self.user_id, self.vendor_id + 1), 0)
+
+
+class IdempotencyTest(PointsTestCase):
+
+    def test_key_is_claimed_once(self):
+        self.assertTrue(claim_idempotency_key('abc', 'deal'))
+        self.assertFalse(claim_idempotency_key('abc', 'deal'))
+        db.session.commit()
+        self.assertFalse(claim_idempotency_key('abc', 'deal'))
+        self.assertTrue(claim_idempotency_key('abd', 'deal'))
+
+    def test_rolled_back_claim_can_be_claimed_again(self):
+        self.assertTrue(claim_idempotency_key('abc', 'deal'))
+        db.session.rollback()
+        self.assertTrue(claim_idempotency_key('abc', 'deal'))
+
+
+class RedemptionTest(PointsTestCase):
+
+    def test_double_submit_is_applied_once(self):
+        record_points(self.user_id, self.vendor_id, 30, 'purchase')
+        db.session.commit()
+        self.redeem(idempotency_key='submit-1')
+        self.assertEqual(self.flashes(), ['Purchase of Deal Logged'])
+        self.redeem(idempotency_key='submit-1')
+        self.assertEqual(self.flashes(), ['Purchase of Deal was already logged'])
+        self.redeem(headers={'Idempotency-Key': 'submit-1'})
+        self.assertEqual(self.flashes(), ['Purchase of Deal was already logged'])
+        self.assertEqual(points_balance(self.user_id, self.vendor_id), 20)
+        self.assertEqual(self.ledger(), [(30, 'purchase', False), (-10, 'deal', False)])
+
+    def test_insufficient_balance_is_refused(self):
+        record_points(self.user_id, self.vendor_id, 9, 'purchase')
+        db.session.commit()
+        self.redeem(idempotency_key='short')
+        self.assertEqual(self.flashes(), ['Not enough points to purchase deal with points'])
+        self.assertEqual(points_balance(self.user_id, self.vendor_id), 9)
+        #the refused attempt released its key, so a retry once the points are there goes through
+        record_points(self.user_id, self.vendor_id, 1, 'purchase')
+        db.session.commit()
+        self.redeem(idempotency_key='short')
+        self.assertEqual(self.flashes(), ['Purchase of Deal Logged'])
+        self.assertEqual(points_balance(self.user_id, self.vendor_id), 0)
+        self.redeem()
+        self.assertEqual(self.flashes(), ['Not enough points to purchase deal with points'])
+        self.assertEqual(points_balance(self.user_id, self.vendor_id), 0)
+
+    def test_redemption_spends_compacted_points(self):
+        accrue_points(self.user_id, self.vendor_id, 10)
+        db.session.commit()
+        self.redeem()
+        self.assertEqual(self.flashes(), ['Purchase of Deal Logged'])
+        self.assertEqual(self.stored_points(), 10)
+        self.assertEqual(points_balance(self.user_id, self.vendor_id), 0)
+
+    def test_deal_of_another_vendor_is_refused(self):
+        record_points(self.user_id, self.vendor_id, 30, 'purchase')
+        db.session.commit()
+        self.redeem(vendor_id=self.vendor_id + 1)
+        self.assertEqual(self.flashes(), ['Purchase could not be logged'])
+        self.assertEqual(points_balance(self.user_id, self.vendor_id), 30)
+
+
+if __name__ == '__main__':
+    unittest.main()
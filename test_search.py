@@ -0,0 +1,100 @@
+import unittest
+
+from search import TrigramIndex, PrefixIndex, padded_trigrams, term_trigrams
+
+VENDORS = [
+    (1, 'Taco Palace'),
+    (2, 'Pizza Palace'),
+    (3, 'Thai Garden'),
+    (4, 'Garden Grill'),
+    (5, 'Palace of Tacos'),
+]
+
+
+class TrigramTest(unittest.TestCase):
+
+    def test_padded_trigrams_match_pg_trgm(self):
+        self.assertEqual(padded_trigrams('Cat'), {'  c', ' ca', 'cat', 'at '})
+        self.assertEqual(term_trigrams('cat'), {'cat'})
+        self.assertEqual(term_trigrams('ab'), {'  a', ' ab', 'ab '})
+
+
+class TrigramIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = TrigramIndex(threshold=0.5)
+        self.index.build(VENDORS)
+
+    def ids(self, term, limit=None):
+        return [item_id for item_id, text, score in self.index.search(term, limit)]
+
+    def test_substring_matches(self):
+        self.assertEqual(sorted(self.ids('garden')), [3, 4])
+
+    def test_tolerates_typos(self):
+        self.assertIn(3, self.ids('thia garden'))
+        self.assertEqual(self.ids('pizaz palace')[0], 2)
+
+    def test_ranks_by_share_then_similarity(self):
+        #both contain every trigram of the term; the shorter name is more similar
+        self.assertEqual(self.ids('taco')[:2], [1, 5])
+        #equal share and similarity fall back to the name
+        results = self.index.search('palace')
+        self.assertTrue(all(score == 1.0 for item_id, text, score in results))
+        self.assertEqual([item_id for item_id, text, score in results], [2, 1, 5])
+
+    def test_threshold_and_limit(self):
+        self.assertEqual(self.ids('zzzz'), [])
+        self.assertEqual(len(self.ids('palace', 2)), 2)
+        self.index.threshold = 1.0
+        self.assertEqual(self.ids('thia'), [])
+
+    def test_update_replaces_text(self):
+        self.index.update(2, 'Noodle Bar')
+        self.assertNotIn(2, self.ids('pizza'))
+        self.assertEqual(self.ids('noodle'), [2])
+        self.index.update(6, 'Pizza Corner')
+        self.assertEqual(self.ids('pizza'), [6])
+
+    def test_remove(self):
+        self.index.remove(3)
+        self.assertEqual(self.ids('garden'), [4])
+        self.index.remove(3)
+        self.assertEqual(self.ids('thai'), [])
+        self.assertFalse(any(3 in postings for postings in self.index._postings.values()))
+
+    def test_unbuilt_index_ignores_changes(self):
+        index = TrigramIndex()
+        index.update(1, 'Taco Palace')
+        self.assertEqual(index.search('taco'), [])
+
+
+class PrefixIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = PrefixIndex()
+        self.index.build(VENDORS)
+
+    def test_completes_any_word(self):
+        self.assertEqual(self.index.complete('gar'), [(3, 'Thai Garden'), (4, 'Garden Grill')])
+        self.assertEqual(self.index.complete('Pal'), [(1, 'Taco Palace'), (2, 'Pizza Palace'), (5, 'Palace of Tacos')])
+
+    def test_each_item_once_and_limit(self):
+        self.assertEqual(self.index.complete('taco'), [(1, 'Taco Palace'), (5, 'Palace of Tacos')])
+        self.assertEqual(len(self.index.complete('p', limit=2)), 2)
+        self.assertEqual(self.index.complete('  '), [])
+
+    def test_update_and_remove_keep_keys_sorted(self):
+        self.index.update(4, 'Burger Barn')
+        self.index.update(7, 'Garlic Knots')
+        self.assertEqual(self.index.complete('gar'), [(3, 'Thai Garden'), (7, 'Garlic Knots')])
+        self.index.remove(3)
+        self.assertEqual(self.index.complete('gar'), [(7, 'Garlic Knots')])
+        self.assertEqual(self.index._keys, sorted(self.index._keys))
+        fresh = PrefixIndex()
+        fresh.build([(1, 'Taco Palace'), (2, 'Pizza Palace'), (4, 'Burger Barn'), (5, 'Palace of Tacos'), (7, 'Garlic Knots')])
+        self.assertEqual(self.index._keys, fresh._keys)
+
+
+if __name__ == '__main__':
+    unittest.main()
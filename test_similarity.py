@@ -0,0 +1,59 @@
+import random
+import unittest
+
+from similarity import SimilarityIndex
+
+
+#Ranks by brute force: shared non-empty attributes, most first, then id
+def brute_force(rows, vendor_id, top_k):
+    attributes = dict((row[0], row[1:]) for row in rows)
+    mine = attributes[vendor_id]
+    counts = []
+    for other_id, theirs in attributes.items():
+        shared = sum(1 for a, b in zip(mine, theirs) if a is not None and a == b)
+        if other_id != vendor_id and shared:
+            counts.append((other_id, shared))
+    return sorted(counts, key=lambda item: (-item[1], item[0]))[:top_k]
+
+
+class SimilarityIndexTest(unittest.TestCase):
+
+    def test_build_matches_brute_force(self):
+        generator = random.Random(7)
+        rows = [(vendor_id, generator.choice(['Counter', 'Sit-down', None]), generator.choice(['Thai', 'Greek', 'Mexican', None]),
+            generator.choice([1, 2, 3, None])) for vendor_id in range(1, 400)]
+        for top_k in (0, 1, 5, 10):
+            index = SimilarityIndex(top_k)
+            index.build(rows)
+            for vendor_id, category, cuisine, cost in rows:
+                self.assertEqual(index.neighbors(vendor_id), brute_force(rows, vendor_id, top_k))
+
+    def test_update_and_remove_rerank_neighbors(self):
+        rows = [(1, 'Counter', 'Thai', 1), (2, 'Counter', 'Thai', 2), (3, 'Sit-down', 'Greek', 3)]
+        index = SimilarityIndex(10)
+        index.build(rows)
+        self.assertEqual(index.neighbors(1), [(2, 2)])
+        index.update(3, ('Counter', 'Thai', 1))
+        self.assertEqual(index.neighbors(1), [(3, 3), (2, 2)])
+        index.remove(2)
+        self.assertEqual(index.neighbors(1), [(3, 3)])
+        self.assertEqual(index.neighbors(2), [])
+
+    def test_changes_during_a_build_are_kept(self):
+        index = SimilarityIndex(10)
+        index.build([(1, 'Counter', 'Thai', 1)])
+
+        def rows():
+            yield (1, 'Counter', 'Thai', 1)
+            index.update(2, ('Counter', 'Thai', 1))
+            index.remove(1)
+            yield (3, 'Counter', 'Greek', 1)
+
+        index.build(rows())
+        self.assertEqual(index.neighbors(2), [(3, 2)])
+        self.assertEqual(index.neighbors(3), [(2, 2)])
+        self.assertEqual(index.neighbors(1), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
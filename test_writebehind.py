@@ -0,0 +1,134 @@
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from writebehind import WriteBehindQueue
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+#Queues three entries in a child process whose writes never finish, then kills it
+CRASHING_WRITER = '''
+import os, sys, time
+sys.path.insert(0, sys.argv[1])
+from writebehind import WriteBehindQueue
+queue = WriteBehindQueue(sys.argv[2], lambda entries: time.sleep(60), max_delay=0.01)
+for n in range(3):
+    queue.put({"n": n})
+os._exit(0)
+'''
+
+
+class Poison(Exception):
+    pass
+
+
+class Hold(Exception):
+    pass
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(0.01)
+
+
+class WriteBehindQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool_dir, True)
+        self.applied = []
+        self.lock = threading.Lock()
+
+    def spool_files(self):
+        return glob.glob(os.path.join(self.spool_dir, 'spool-*.jsonl'))
+
+    def read_lines(self, path):
+        with open(path, encoding='utf-8') as spool:
+            return [json.loads(line) for line in spool]
+
+    def test_spool_of_a_crashed_process_is_replayed(self):
+        subprocess.check_call([sys.executable, '-c', CRASHING_WRITER, HERE, self.spool_dir])
+        self.assertEqual(len(self.spool_files()), 1)
+
+        queue = WriteBehindQueue(self.spool_dir, self.applied.extend, max_delay=0.01, fsync=False)
+        queue.start()
+        wait_for(lambda: len(self.applied) == 3)
+        self.assertEqual(sorted(entry["n"] for entry in self.applied), [0, 1, 2])
+        self.assertEqual(self.spool_files(), [queue._spool_path])
+
+    def test_poison_entry_goes_to_the_dead_letter_file(self):
+        def apply_batch(entries):
+            if any(entry["n"] == 2 for entry in entries):
+                raise Poison()
+            with self.lock:
+                self.applied.extend(entry["n"] for entry in entries)
+
+        queue = WriteBehindQueue(self.spool_dir, apply_batch, max_batch=10, max_delay=0.01, fsync=False, permanent_errors=(Poison,))
+        for n in range(5):
+            queue.put({"n": n})
+        wait_for(lambda: queue.depth() == 0)
+        self.assertEqual(sorted(self.applied), [0, 1, 3, 4])
+        dead = self.read_lines(os.path.join(self.spool_dir, 'dead-letter.jsonl'))
+        self.assertEqual([entry["n"] for entry in dead], [2])
+        self.assertEqual(queue.stats["dead_lettered"], 1)
+        self.assertEqual(queue.stats["flushed"], 4)
+
+    def test_transient_failure_keeps_the_rest_queued(self):
+        failures = {"left": 1}
+
+        def apply_batch(entries):
+            if any(entry["n"] == 0 for entry in entries):
+                raise Poison()
+            if entries[0]["n"] == 2 and failures["left"]:
+                failures["left"] -= 1
+                raise Hold()
+            self.applied.extend(entry["n"] for entry in entries)
+
+        queue = WriteBehindQueue(self.spool_dir, apply_batch, max_batch=10, max_delay=60, fsync=False, permanent_errors=(Poison,))
+        queue.started = True
+        queue._open_spool()
+        for n in range(4):
+            queue._entries.append({"key": str(n), "n": n, "queued_at": time.time()})
+        self.assertEqual(queue.flush(), 2)
+        self.assertEqual([entry["n"] for entry in queue._entries], [2, 3])
+        self.assertEqual(queue.stats["failures"], 1)
+        self.assertEqual(queue.flush(), 2)
+        self.assertEqual(self.applied, [1, 2, 3])
+
+    def test_compaction_keeps_unapplied_entries(self):
+        state = {"open": False}
+
+        def apply_batch(entries):
+            if not state["open"] or any(entry["n"] >= 16 for entry in entries):
+                raise Hold()
+            with self.lock:
+                self.applied.extend(entry["n"] for entry in entries)
+
+        queue = WriteBehindQueue(self.spool_dir, apply_batch, max_batch=2, max_delay=0.01, fsync=False)
+        for n in range(20):
+            queue.put({"n": n})
+        first_spool = queue._spool_path
+        state["open"] = True
+        wait_for(lambda: len(self.applied) == 16)
+
+        self.assertNotIn(first_spool, self.spool_files())
+        self.assertEqual(self.spool_files(), [queue._spool_path])
+        self.assertEqual([entry["n"] for entry in self.read_lines(queue._spool_path)], [16, 17, 18, 19])
+
+        queue.apply_batch = self.applied.extend
+        wait_for(lambda: queue.depth() == 0)
+        self.assertEqual(os.path.getsize(queue._spool_path), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+import uuid
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+
+from entities import get_entity
+from extensions import db
+from forms import DealForm
+from models import Vendor, User, Deals
+from points import claim_idempotency_key, lock_points_balance, points_balance, record_points
+
+#Deals and spending points on them
+bp = Blueprint('deals', __name__)
+
+#  Updating Rewards When Rewards Used To Purchase Deal
+#  ----------------------------------------------------------------
+@bp.route('/vendors/<int:vendor_id>/purchase_deal', methods = ['GET', 'POST'])
+def create_purchase_deal_form(vendor_id):
+
+  vendor = get_entity(Vendor, vendor_id)
+  users = User.query.with_entities(User.id, User.username).all()
+
+  deals = vendor.offers
+  allDeals = []
+
+  for deal in deals: 
+    deal_info= {
+      "id": deal.id,
+      "item": deal.item,
+      "price": deal.price
+    }
+    allDeals.append(deal_info)
+
+  user_info =[]
+  for user in users:
+    info = {
+      "id": user.id,
+      "username": user.username
+    }
+    user_info.append(info)
+  
+  data = {
+    "users": user_info,
+    "vendor_id": vendor.id,
+    "deals" : allDeals,
+    "idempotency_key": uuid.uuid4().hex
+  }
+  return render_template('forms/purchase_deal.html', data=data)
+
+@bp.route('/vendors/<int:vendor_id>/purchase_deal_info', methods=['POST'])
+def create_purchase_deal_submission(vendor_id):
+
+  user_id = int(request.form['user'])
+  deal = get_entity(Deals, request.form['item'])
+  idempotency_key = request.headers.get('Idempotency-Key') or request.form.get('idempotency_key')
+
+  if request.form['purchase_type'] == 'points':
+    if deal is None or deal.vendor_id != vendor_id:
+      flash('Purchase could not be logged')
+      return redirect(url_for('users.show_user', user_id=user_id))
+    points_required = deal.points_required
+    try:
+      if idempotency_key and not claim_idempotency_key(idempotency_key, 'deal'):
+        db.session.rollback()
+        flash('Purchase of Deal was already logged')
+      else:
+        lock_points_balance(user_id, vendor_id)
+        if points_balance(user_id, vendor_id) >= points_required:
+          record_points(user_id, vendor_id, -points_required, 'deal', reference=idempotency_key, deal_id=deal.id)
+          db.session.commit()
+          flash('Purchase of Deal Logged')
+        else:
+          db.session.rollback()
+          flash('Not enough points to purchase deal with points')
+    except:
+      db.session.rollback()
+      flash('Purchase could not be logged')
+    finally:
+      db.session.close()
+  
+  
+  return redirect(url_for('users.show_user', user_id=user_id))
+
+
+#  Create Deals
+ #  ----------------------------------------------------------------
+
+@bp.route('/deals/create', methods=['GET',])
+def create_deal_form():
+  form = DealForm()
+  return render_template('forms/new_deal.html', form=form)
+
+@bp.route('/deals/create', methods=['POST'])
+def create_deals_submission():
+  new_deal = Deals()
+  new_deal.item = (request.form['item'])
+  new_deal.price = int(request.form['price'])
+  new_deal.points_required = int(request.form['points_required'])
+  new_deal.vendor_id = int(request.form['vendor_id'])
+  try:
+    db.session.add(new_deal)
+    db.session.commit()
+     # on successful db insert, flash success
+    flash('Deal ' + request.form['item'] + ' were successfully added!')
+  except:
+    db.session.rollback()
+     #on unsuccessful db insert, flash an error instead.
+    flash('An error occurred. Deal ' + new_deal.item + ' could not be added.')
+  finally:
+    db.session.close()
+  return redirect(url_for('main.index'))
@@ -0,0 +1,139 @@
+import mimetypes
+import os
+import click
+from flask import Blueprint, Response, abort, current_app, jsonify, render_template, request, send_file, stream_with_context, url_for
+from werkzeug.utils import safe_join
+
+from assets import build_assets, get_asset_manifest, set_asset_manifest
+from entities import entity_cache_stats, report_entity_cache
+from export import serialize_rows
+from extensions import db
+from indexes import get_search_index, vendor_prefix_index, user_prefix_index
+from models import favorites, Vendor, User, Deals, Menu, PointsLedger
+from pages import cached_page, get_page_cache
+from points import all_points_balances
+
+#Home page, statistics, autocomplete, exports and static assets
+bp = Blueprint('main', __name__, cli_group=None)
+
+bp.after_app_request(report_entity_cache)
+
+@bp.route('/')
+@cached_page(lambda: ['vendors'])
+def index():
+  recentVendors = Vendor.query.order_by(db.desc(Vendor.id)).limit(10).all()
+  return render_template('pages/home.html',vendors = recentVendors)
+
+@bp.route('/api/entity-cache-stats', methods=['GET'])
+def entity_cache_statistics():
+  return jsonify(entity_cache_stats)
+
+@bp.route('/api/page-cache-stats', methods=['GET'])
+def page_cache_statistics():
+  page_cache = get_page_cache()
+  if page_cache is None:
+    return jsonify({"enabled": False})
+  return jsonify(dict(page_cache.stats, enabled=True))
+
+#Typeahead suggestions for the search boxes, served from the prefix indexes
+@bp.route('/api/autocomplete', methods=['GET'])
+def autocomplete():
+  prefix = request.args.get('q', '')
+  limit = min(request.args.get('limit', current_app.config.get('AUTOCOMPLETE_LIMIT', 10), type=int), 50)
+  vendors = get_search_index(vendor_prefix_index, Vendor, Vendor.name).complete(prefix, limit)
+  users = get_search_index(user_prefix_index, User, User.username).complete(prefix, limit)
+  return jsonify({
+    "vendors": [{"id": vendor_id, "name": name} for vendor_id, name in vendors],
+    "users": [{"id": user_id, "name": username} for user_id, username in users]
+  })
+
+
+#  Export
+#  ----------------------------------------------------------------
+#Tables that can be exported, by the name used in URLs and on the command line.
+#rewards only holds the compacted part of each balance, so the rewards export
+#is the current balances read through all_points_balances(), and the ledger
+#itself is exported as points_ledger.
+EXPORT_TABLES = {
+  'vendors': Vendor.__table__,
+  'menus': Menu.__table__,
+  'deals': Deals.__table__,
+  'users': User.__table__,
+  'rewards': all_points_balances,
+  'points_ledger': PointsLedger.__table__,
+  'favorites': favorites
+}
+
+#Streams every row of a table as CSV or JSONL text. Rows are read with a
+#server-side cursor in yield_per batches, so memory stays flat however big
+#the table is and the first bytes go out as soon as the first batch arrives.
+#An export given as a function returns the select to stream instead.
+def export_table(name, fmt):
+  source = EXPORT_TABLES[name]
+  chunk_size = current_app.config.get('EXPORT_CHUNK_SIZE', 1000)
+  if callable(source):
+    stmt = source()
+  else:
+    stmt = db.select(*source.columns).order_by(*source.primary_key.columns)
+  columns = [column.name for column in stmt.selected_columns]
+  return serialize_rows(columns, db.session.execute(stmt.execution_options(yield_per=chunk_size)), fmt)
+
+@bp.route('/api/export/<name>.<fmt>', methods=['GET'])
+def export_endpoint(name, fmt):
+  if name not in EXPORT_TABLES or fmt not in ('csv', 'jsonl'):
+    return jsonify({"error": "unknown export", "tables": sorted(EXPORT_TABLES)}), 404
+  mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+  response = Response(stream_with_context(export_table(name, fmt)), mimetype=mimetype)
+  response.headers['Content-Disposition'] = 'attachment; filename={}.{}'.format(name, fmt)
+  return response
+
+@bp.cli.command('export')
+@click.argument('name', type=click.Choice(sorted(EXPORT_TABLES)))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default='jsonl')
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-', help='Defaults to stdout.')
+def export_command(name, fmt, output):
+  for text in export_table(name, fmt):
+    output.write(text)
+  db.session.close()
+
+
+#  Static Assets
+#  ----------------------------------------------------------------
+#`flask build-assets` copies static/ into ASSETS_BUILD_DIR under content-hashed
+#names with gzip and brotli siblings and writes the manifest asset_url() reads.
+@bp.app_template_global()
+def asset_url(path):
+  fingerprinted = get_asset_manifest().get(path)
+  if fingerprinted is None:
+    return url_for('static', filename=path)
+  return url_for('main.fingerprinted_asset', filename=fingerprinted)
+
+@bp.cli.command('build-assets')
+@click.option('--no-compress', is_flag=True, help='Skip the gzip and brotli siblings.')
+def build_assets_command(no_compress):
+  manifest = build_assets(current_app.static_folder, current_app.config.get('ASSETS_BUILD_DIR', 'build/static'), compress=not no_compress)
+  set_asset_manifest(manifest)
+  print("Built", len(manifest), "assets")
+
+#Fingerprinted names change with their content, so they are cached for a year
+#and never revalidated. The brotli or gzip sibling is sent when the client
+#accepts it.
+@bp.route('/assets/<path:filename>')
+def fingerprinted_asset(filename):
+  path = safe_join(current_app.config.get('ASSETS_BUILD_DIR', 'build/static'), filename)
+  if path is None or not os.path.isfile(path):
+    abort(404)
+  encoding = None
+  for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+    if request.accept_encodings[candidate] and os.path.isfile(path + suffix):
+      encoding = candidate
+      path = path + suffix
+      break
+  response = send_file(os.path.abspath(path), mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+    conditional=True, max_age=current_app.config.get('ASSETS_MAX_AGE', 31536000))
+  if encoding is not None:
+    response.headers['Content-Encoding'] = encoding
+  response.headers['Vary'] = 'Accept-Encoding'
+  response.cache_control.public = True
+  response.cache_control.immutable = True
+  return response
@@ -0,0 +1,41 @@
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+
+from entities import get_entity
+from events import vendor_change_handlers
+from indexes import current_index, table_state, vendor_similarity_rows
+from models import Vendor
+from quiz import QuizAnswerTable, QUIZ_QUESTIONS
+
+#The quiz that picks a vendor from the answers
+bp = Blueprint('quiz', __name__)
+
+quiz_answers = QuizAnswerTable()
+
+#Returns the quiz answer table, built from the vendor table and kept current
+def get_quiz_answers():
+  return current_index(quiz_answers, table_state(Vendor), vendor_similarity_rows)
+
+#rebuilds the answers affected by committed vendor changes
+def update_quiz_answers(changes):
+  quiz_answers.apply([(change['vendor_id'], None if change['action'] == 'delete' else
+    (change['category'], change['cuisine'], change['cost'])) for change in changes])
+
+vendor_change_handlers.append(update_quiz_answers)
+
+@bp.route('/quiz', methods=['GET'])
+def create_quiz():
+  return render_template('forms/quiz.html')
+
+@bp.route('/quiz/results', methods=['POST'])
+def get_results():
+  answers = tuple(int(request.form[name]) for name, values in QUIZ_QUESTIONS)
+
+  vendor_id = get_quiz_answers().lookup(answers)
+  if vendor_id is None:
+    flash('No vendor matches your answers yet, please try again later.')
+    return redirect(url_for('quiz.create_quiz'))
+  vendor = get_entity(Vendor, vendor_id)
+  data = vendor
+
+  
+  return render_template('pages/results.html', data=data)
@@ -0,0 +1,396 @@
+import atexit
+import hashlib
+import io
+import json
+import os
+import threading
+import click
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import partial
+from flask import Blueprint, Response, current_app, flash, jsonify, redirect, render_template, request, stream_with_context, url_for
+from sqlalchemy.exc import IntegrityError
+
+from entities import get_entity
+from events import record_cache_tags
+from extensions import db
+from ingest import read_records, parse_purchase, chunked, detect_format
+from models import Vendor, User, Menu, PointsLedger, IdempotencyKey
+from points import accrue_points, record_points
+from writebehind import WriteBehindQueue
+
+#Purchases that earn points, the points ledger and its maintenance commands
+bp = Blueprint('rewards', __name__, cli_group=None)
+
+#  Creating and Updating Rewards
+#  ----------------------------------------------------------------
+@bp.route('/vendors/<int:vendor_id>/purchase', methods = ['GET', 'POST'])
+def create_purchase_form(vendor_id):
+
+
+  vendor = get_entity(Vendor, vendor_id)
+  users = User.query.with_entities(User.id, User.username).all()
+
+  menuItems = vendor.menuItems
+  fullMenu = []
+
+  for menu in menuItems: 
+    menu_info= {
+      "menu_id": menu.id,
+      "menu_item": menu.item,
+      "menu_price": menu.price
+    }
+    fullMenu.append(menu_info)
+
+  user_info =[]
+  for user in users:
+    info = {
+      "id": user.id,
+      "username": user.username
+    }
+    user_info.append(info)
+  
+  data = {
+    "users": user_info,
+    "vendor_id": vendor.id,
+    "menu" : fullMenu
+  }
+  return render_template('forms/purchase.html', data=data)
+
+#Deletes idempotency keys older than the retry window
+@bp.cli.command('prune-idempotency-keys')
+def prune_idempotency_keys():
+  cutoff = datetime.utcnow() - timedelta(days=current_app.config.get('IDEMPOTENCY_KEY_DAYS', 7))
+  try:
+    result = db.session.execute(IdempotencyKey.__table__.delete().where(IdempotencyKey.created_at < cutoff))
+    db.session.commit()
+  except:
+    db.session.rollback()
+    raise
+  finally:
+    db.session.close()
+  print("Pruned", result.rowcount, "idempotency keys")
+
+#Folds un-compacted ledger rows into rewards balances, a batch per transaction
+@bp.cli.command('compact-points-ledger')
+def compact_points_ledger():
+  batch_size = current_app.config.get('POINTS_LEDGER_COMPACT_BATCH', 10000)
+  compacted = 0
+  while True:
+    entries = db.session.query(PointsLedger.id, PointsLedger.user_id, PointsLedger.vendor_id, PointsLedger.delta).filter(
+      PointsLedger.compacted == False).order_by(PointsLedger.id).limit(batch_size).all()
+    if not entries:
+      break
+
+    totals = Counter()
+    for entry_id, user_id, vendor_id, delta in entries:
+      totals[(user_id, vendor_id)] += delta
+    entry_ids = [entry[0] for entry in entries]
+
+    try:
+      #a concurrent compaction that claimed some of these rows first makes the rowcount short
+      claimed = db.session.execute(PointsLedger.__table__.update().where(
+        PointsLedger.id.in_(entry_ids), PointsLedger.compacted == False).values(compacted=True))
+      if claimed.rowcount != len(entry_ids):
+        raise RuntimeError('points ledger rows were compacted concurrently, try again')
+      for (user_id, vendor_id), delta in totals.items():
+        accrue_points(user_id, vendor_id, delta)
+      db.session.commit()
+    except:
+      db.session.rollback()
+      raise
+    finally:
+      db.session.close()
+    compacted += len(entries)
+  print("Compacted", compacted, "ledger rows")
+
+#Reads the basket from a purchase form: each checked `items` id once, with the
+#quantity from its optional quantity_<id> field. An id repeated in the form is
+#still bought once. Returns None if an id is not a number.
+def basket_from_form(form):
+  basket = Counter()
+  for menu_id in form.getlist('items'):
+    if not menu_id.isdigit():
+      return None
+    quantity = form.get('quantity_' + menu_id, 1, type=int)
+    if quantity is None or quantity < 1 or int(menu_id) in basket:
+      continue
+    basket[int(menu_id)] = quantity
+  return basket
+
+#Total price of a basket of menu items, resolved in one query. Returns None if
+#any item does not exist or belongs to another vendor.
+def basket_price(vendor_id, basket):
+  if not basket:
+    return None
+  prices = dict(db.session.query(Menu.id, Menu.price).filter(
+    Menu.id.in_(list(basket)), Menu.vendor_id == vendor_id))
+  if len(prices) != len(basket):
+    return None
+  return sum((prices[menu_id] or 0) * quantity for menu_id, quantity in basket.items())
+
+@bp.route('/vendors/<int:vendor_id>/purchase_info', methods=['POST'])
+def create_purchase_submission(vendor_id):
+  user_id = int(request.form['user'])
+  vendor = get_entity(Vendor, vendor_id)
+  conversion = vendor.purchase_to_points
+  if conversion is None:
+    flash('Purchase could not be made! This vendor does not award points yet.')
+    return redirect(url_for('vendors.show_vendor', vendor_id=vendor_id))
+  if get_entity(User, user_id) is None:
+    flash('Purchase could not be made! Choose an existing user.')
+    return redirect(url_for('rewards.create_purchase_form', vendor_id=vendor_id))
+
+  basket = basket_from_form(request.form)
+  price = basket_price(vendor_id, basket)
+  if price is None:
+    flash('Purchase could not be made! Choose items from this vendor\'s menu.')
+    return redirect(url_for('rewards.create_purchase_form', vendor_id=vendor_id))
+  new_points = price * conversion
+  reference = 'menu:' + ','.join('{}x{}'.format(menu_id, quantity) for menu_id, quantity in sorted(basket.items()))
+
+  if current_app.config.get('PURCHASE_WRITE_BEHIND'):
+    try:
+      get_purchase_queue().put({"user_id": user_id, "vendor_id": vendor_id, "delta": new_points, "reference": reference})
+      flash('Purchase Made')
+    except (IOError, OSError):
+      current_app.logger.exception('could not queue a purchase')
+      flash('Purchase could not be made!')
+    finally:
+      db.session.close()
+    return redirect(url_for('users.show_user', user_id=user_id))
+
+  try:
+    record_points(user_id, vendor_id, new_points, 'purchase', reference=reference)
+    db.session.commit()
+    # on successful db insert, flash success
+    flash('Purchase Made')
+  except:
+    db.session.rollback()
+    # on unsuccessful db insert, flash an error instead.
+    flash('Purchase could not be made!')
+  finally:
+    db.session.close()
+  return redirect(url_for('users.show_user', user_id=user_id))
+
+
+
+#  Write-Behind Purchases
+#  ----------------------------------------------------------------
+purchase_queue = None
+purchase_queue_lock = threading.Lock()
+
+#Commits a batch of queued purchases in one transaction: one query skips the
+#entries already applied before a crash, then the idempotency keys and ledger
+#rows go in with one multi-row insert each. The queue's thread runs it outside
+#any request, so it pushes a context of the app that started the queue.
+def apply_purchase_batch(app, entries):
+  with app.app_context():
+    try:
+      keys = [entry["key"] for entry in entries]
+      applied = set(key for (key,) in db.session.query(IdempotencyKey.key).filter(IdempotencyKey.key.in_(keys)))
+      now = datetime.utcnow()
+      fresh = {}
+      for entry in entries:
+        if entry["key"] not in applied:
+          fresh[entry["key"]] = entry
+      if fresh:
+        db.session.execute(IdempotencyKey.__table__.insert(), [
+          {"key": key, "scope": 'purchase-queue', "created_at": now} for key in fresh])
+        db.session.execute(PointsLedger.__table__.insert(), [{
+          "user_id": entry["user_id"],
+          "vendor_id": entry["vendor_id"],
+          "delta": entry["delta"],
+          "reason": 'purchase',
+          "reference": entry.get("reference"),
+          "deal_id": None,
+          "created_at": datetime.utcfromtimestamp(entry["queued_at"]),
+          "compacted": False
+        } for entry in fresh.values()])
+        record_cache_tags(*set('user:{}'.format(entry["user_id"]) for entry in fresh.values()))
+      db.session.commit()
+    except:
+      db.session.rollback()
+      raise
+    finally:
+      db.session.close()
+
+#Purchases a constraint rejects, such as one for a user deleted while it was
+#queued, are moved to the spool's dead-letter file instead of blocking the queue
+def get_purchase_queue():
+  global purchase_queue
+  if purchase_queue is None:
+    with purchase_queue_lock:
+      if purchase_queue is None:
+        queue = WriteBehindQueue(
+          current_app.config.get('PURCHASE_SPOOL_DIR', 'spool'),
+          partial(apply_purchase_batch, current_app._get_current_object()),
+          max_batch=current_app.config.get('PURCHASE_QUEUE_MAX_BATCH', 500),
+          max_delay=current_app.config.get('PURCHASE_QUEUE_MAX_DELAY', 0.05),
+          permanent_errors=(IntegrityError,)
+        )
+        queue.start()
+        atexit.register(queue.drain)
+        purchase_queue = queue
+  return purchase_queue
+
+#Queue depth, the age of the oldest queued purchase and flush latencies
+@bp.route('/api/purchase-queue-stats', methods=['GET'])
+def purchase_queue_statistics():
+  if purchase_queue is None:
+    return jsonify({"enabled": bool(current_app.config.get('PURCHASE_WRITE_BEHIND')), "depth": 0})
+  metrics = purchase_queue.metrics()
+  metrics["enabled"] = bool(current_app.config.get('PURCHASE_WRITE_BEHIND'))
+  return jsonify(metrics)
+
+
+#  Bulk Purchase Ingestion
+#  ----------------------------------------------------------------
+#Applies a stream of (line_number, record, error) purchase records chunk by
+#chunk. Menu prices, vendor conversions and user ids are resolved with one
+#query each per chunk, the points go into the ledger with one multi-row
+#insert, and each chunk commits on its own, so memory stays bounded by the
+#chunk size. Yields a progress dict after every chunk; bad rows are counted
+#and the first few are reported without stopping the import.
+#Every applied record leaves an idempotency key in its chunk's transaction,
+#made from its reference or else from source and its line number, so running
+#the same file again skips the records already applied instead of crediting
+#them twice while the keys are kept (IDEMPOTENCY_KEY_DAYS). Records with
+#neither a reference nor a source are not keyed.
+def ingest_purchases(records, chunk_size, source=None):
+  progress = {"processed": 0, "applied": 0, "skipped": 0, "points": 0, "failed": 0, "errors": []}
+  max_errors = current_app.config.get('INGEST_MAX_REPORTED_ERRORS', 100)
+  ledger = PointsLedger.__table__
+
+  def reject(line_number, message):
+    progress["failed"] += 1
+    if len(progress["errors"]) < max_errors:
+      progress["errors"].append({"line": line_number, "error": message})
+
+  for chunk in chunked(records, chunk_size):
+    purchases = []
+    for line_number, record, error in chunk:
+      if error is None:
+        try:
+          purchases.append((line_number, parse_purchase(record)))
+          continue
+        except ValueError as parse_error:
+          error = str(parse_error)
+      reject(line_number, error)
+
+    keys = {}
+    for line_number, purchase in purchases:
+      key = ingest_key(purchase[4], source, line_number)
+      if key is not None:
+        keys[line_number] = key
+    applied = set()
+    if keys:
+      applied = set(key for (key,) in db.session.query(IdempotencyKey.key).filter(IdempotencyKey.key.in_(set(keys.values()))))
+    fresh = []
+    for line_number, purchase in purchases:
+      if keys.get(line_number) in applied:
+        progress["skipped"] += 1
+      else:
+        fresh.append((line_number, purchase))
+    purchases = fresh
+
+    menu_ids = set(purchase[2] for line_number, purchase in purchases)
+    user_ids = set(purchase[0] for line_number, purchase in purchases)
+    menu = {}
+    if menu_ids:
+      for menu_id, menu_vendor_id, price in db.session.query(Menu.id, Menu.vendor_id, Menu.price).filter(Menu.id.in_(menu_ids)):
+        menu[menu_id] = (menu_vendor_id, price or 0)
+    vendor_ids = set(menu_vendor_id for menu_vendor_id, price in menu.values())
+    conversions = dict(db.session.query(Vendor.id, Vendor.purchase_to_points).filter(Vendor.id.in_(vendor_ids))) if vendor_ids else {}
+    known_users = set(row[0] for row in db.session.query(User.id).filter(User.id.in_(user_ids))) if user_ids else set()
+
+    rows = []
+    claimed = []
+    now = datetime.utcnow()
+    for line_number, (user_id, vendor_id, menu_id, quantity, reference) in purchases:
+      if menu_id not in menu:
+        reject(line_number, 'unknown menu item {}'.format(menu_id))
+      elif vendor_id is not None and menu[menu_id][0] != vendor_id:
+        reject(line_number, 'menu item {} does not belong to vendor {}'.format(menu_id, vendor_id))
+      elif user_id not in known_users:
+        reject(line_number, 'unknown user {}'.format(user_id))
+      elif keys.get(line_number) in applied:
+        progress["skipped"] += 1
+      else:
+        menu_vendor_id, price = menu[menu_id]
+        points = price * quantity * (conversions.get(menu_vendor_id) or 0)
+        rows.append({
+          "user_id": user_id,
+          "vendor_id": menu_vendor_id,
+          "delta": points,
+          "reason": 'purchase',
+          "reference": reference or 'menu:{}x{}'.format(menu_id, quantity),
+          "deal_id": None,
+          "created_at": now,
+          "compacted": False
+        })
+        if line_number in keys:
+          applied.add(keys[line_number])
+          claimed.append({"key": keys[line_number], "scope": 'purchase-ingest', "created_at": now})
+        progress["points"] += points
+
+    if rows:
+      try:
+        if claimed:
+          db.session.execute(IdempotencyKey.__table__.insert(), claimed)
+        db.session.execute(ledger.insert(), rows)
+        record_cache_tags(*set('user:{}'.format(row["user_id"]) for row in rows))
+        db.session.commit()
+      except:
+        db.session.rollback()
+        raise
+    progress["applied"] += len(rows)
+    progress["processed"] += len(chunk)
+    yield progress
+  db.session.close()
+
+#The idempotency key of an ingested record, hashed to fit the key column
+def ingest_key(reference, source, line_number):
+  if reference:
+    name = 'reference:' + reference
+  elif source:
+    name = 'line:{}:{}'.format(source, line_number)
+  else:
+    return None
+  return hashlib.sha1(('purchase-ingest:' + name).encode('utf-8')).hexdigest()
+
+@bp.cli.command('ingest-purchases')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None, help='Defaults to the file extension.')
+@click.option('--chunk-size', type=int, default=None, help='Records per transaction.')
+@click.option('--source', default=None, help='Names the file in the keys of records without a reference. Defaults to the file name.')
+def ingest_purchases_command(path, fmt, chunk_size, source):
+  fmt = fmt or detect_format(path)
+  source = source or os.path.basename(path)
+  chunk_size = chunk_size or current_app.config.get('INGEST_CHUNK_SIZE', 5000)
+  progress = None
+  with io.open(path, newline='', encoding='utf-8') as stream:
+    for progress in ingest_purchases(read_records(stream, fmt), chunk_size, source):
+      click.echo('{processed} records, {applied} applied, {skipped} already applied, {failed} failed, {points} points'.format(**progress))
+  if progress:
+    for error in progress["errors"]:
+      click.echo('line {line}: {error}'.format(**error), err=True)
+
+#Streams a CSV or JSONL body through ingest_purchases and reports progress as
+#one JSON line per chunk, the last line being the final totals. ?source=
+#names the upload so records without a reference are skipped on a resend.
+@bp.route('/api/purchases/ingest', methods=['POST'])
+def ingest_purchases_endpoint():
+  fmt = request.args.get('format') or detect_format(request.mimetype)
+  chunk_size = request.args.get('chunk_size', current_app.config.get('INGEST_CHUNK_SIZE', 5000), type=int)
+  stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+
+  def generate():
+    progress = {"processed": 0, "applied": 0, "skipped": 0, "points": 0, "failed": 0, "errors": []}
+    for progress in ingest_purchases(read_records(stream, fmt), chunk_size, request.args.get('source')):
+      update = dict(progress)
+      update.pop("errors")
+      yield json.dumps(update) + '\n'
+    yield json.dumps(progress) + '\n'
+
+  return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
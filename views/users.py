@@ -0,0 +1,180 @@
+from flask import Blueprint, flash, redirect, render_template, request, url_for
+
+from entities import get_entity, loader_for
+from events import record_cache_tags
+from extensions import db
+from forms import UserForm
+from indexes import co_preferred_vendors, recommend_vendors_from_favorites, search_usernames
+from models import favorites, Vendor, User
+from pages import cached_page, conditional_page, keyset_page, user_page_validators
+from points import points_balances, show_rewards
+
+#User pages and favorites
+bp = Blueprint('users', __name__)
+
+#Lists all the users
+@bp.route('/users')
+@cached_page(lambda: ['users'])
+def users():
+  data, next_after = keyset_page(User.query.with_entities(User.id, User.username), User.id)
+  return render_template('pages/users.html', users=data, next_after=next_after,
+    is_first_page='after' not in request.args)
+
+#Searches all the users
+@bp.route('/users/search', methods=['POST'])
+def search_users():
+  search_term = request.form['search_term']
+  results = search_usernames(search_term)
+
+  response={
+    "count": len(results),
+    "data": []
+  }
+  for user_id, username in results:
+    response['data'].append({
+      "id": user_id,
+      "name": username,
+      })
+  return render_template('pages/search_users.html', results=response, search_term=request.form.get('search_term', ''))
+
+#Display infor for user with id = user_id
+@bp.route('/users/<int:user_id>')
+@conditional_page(user_page_validators)
+@cached_page(lambda user_id: ['vendors', 'vendor-neighbors', 'user:{}'.format(user_id)])
+def show_user(user_id):
+  user = get_entity(User, user_id)
+
+  vendor_loader = loader_for(Vendor)
+  favorites = []
+  favorite_ids = set()
+  for vendor in user.favorites:
+    favorites.append(vendor.name)
+    favorite_ids.add(vendor.id)
+    vendor_loader.prime(vendor.id, vendor)
+
+  #reward vendors are fetched together with the first batch of recommendations
+  balances = points_balances(user_id)
+  vendor_loader.want(balances)
+  recs = recommend_vendors_from_favorites(user_id, 3)
+  also_liked = co_preferred_vendors(favorite_ids, 3)
+  rewards_info = show_rewards(balances)
+
+  user={
+    "username" : user.username,
+    "id" : user.id,
+    "favorites" : favorites,
+    "recs" :  recs,
+    "also_liked" : also_liked,
+    "rewards" : rewards_info
+  }
+
+  return render_template('pages/show_user.html', user=user)
+  
+
+#Insert A User
+@bp.route('/users/create', methods=['GET'])
+def create_user_form():
+  form = UserForm()
+  return render_template('forms/new_user.html', form=form)
+
+@bp.route('/users/create', methods=['GET', 'POST'])
+def create_user_submission():
+  new_user = User()
+  new_user.username = request.form['username']
+  try:
+    db.session.add(new_user)
+    db.session.commit()
+    # on successful db insert, flash success
+    flash('User ' + request.form['username'] + ' was successfully added!')
+  except:
+    db.session.rollback()
+    #  on unsuccessful db insert, flash an error instead.
+    flash('An error occurred. Artist ' + new_user.username + ' could not be added.')
+  finally:
+    db.session.close()
+  return redirect(url_for('main.index'))
+
+@bp.route('/users/delete/<int:user_id>', methods=['GET', 'POST'])
+def delete_user(user_id):
+
+  deleted_user = get_entity(User, user_id)
+  userName = deleted_user.username
+  try:
+    db.session.delete(deleted_user)
+    db.session.commit()
+    flash('User ' + userName + ' was successfully deleted!')
+  except:
+    db.session.rollback()
+    flash('Please try again. User ' + userName + ' could not be deleted.')
+  finally:
+    db.session.close()
+  return redirect(url_for('main.index'))
+
+
+#  Add or Delete Favorite Vendor
+ #  ----------------------------------------------------------------
+@bp.route('/users/<int:user_id>/add_favorites', methods=['GET', 'POST'])
+def create_add_favorites_form(user_id):
+
+  vendors, next_after = keyset_page(Vendor.query.with_entities(Vendor.id, Vendor.name), Vendor.id)
+
+  
+  data = {
+    "user_id" : user_id,
+    "vendors" : vendors,
+    "next_after" : next_after,
+    "is_first_page" : 'after' not in request.args
+  }
+
+  return render_template('forms/new_favorite.html', data=data)
+
+@bp.route('/users/<int:user_id>/add_favorites_info', methods=['POST'])
+def create_add_favorites_submission(user_id):
+  
+  vendor_id = request.form['vendor']
+  print(vendor_id)
+  print("is vendor ID")
+  print(user_id)
+  print("is user id")
+  statement = favorites.insert().values(user_id=user_id, vendor_id=vendor_id)
+  try:
+    db.session.execute(statement)
+    record_cache_tags('user:{}'.format(user_id))
+    db.session.commit()
+    flash('Vendor was successfully added to favorites')
+  except:
+    db.session.rollback()
+    flash('An error occurred. Vendor could not be added to favorites')
+  finally:
+    db.session.close()
+  return redirect(url_for('main.index'))
+
+
+@bp.route('/users/<int:user_id>/delete_favorites', methods=['GET', 'POST'])
+def create_delete_favorites_form(user_id):
+  user = get_entity(User, user_id)
+  vendors = user.favorites
+  vendor_info = []
+
+  data = {
+    "user_id" : user_id,
+    "vendors" : vendors
+  }
+  return render_template('forms/delete_favorite.html', data=data)
+
+@bp.route('/users/<int:user_id>/delete_favorites_info', methods=['POST'])
+def create_delete_favorites_submission(user_id):
+  user = get_entity(User, user_id)
+  vendor_id = request.form['vendor']
+  vendor = get_entity(Vendor, vendor_id)
+  user.favorites.remove(vendor)
+
+  try:
+    db.session.commit()
+    flash('Vendor removed from favorites')
+  except:
+    db.session.rollback()
+    flash('Vendor could not be removed from favorites')
+  finally:
+    db.session.close()
+  return redirect(url_for('main.index'))
@@ -0,0 +1,475 @@
+import io
+import json
+import click
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
+from werkzeug.datastructures import MultiDict
+
+from entities import get_entity
+from events import vendor_change_handlers, record_cache_tags
+from extensions import db
+from facets import FacetIndex, FACET_FIELDS
+from forms import VendorForm, MenuForm, DealForm
+from indexes import current_index, find_most_similar, search_vendor_names, stream_pairs, table_state, vendor_similarity_rows
+from ingest import read_records, chunked
+from models import favorites, Vendor, Deals, Menu, VendorNeighbor
+from pages import cached_page, conditional_page, get_page_cache, keyset_page, keyset_page_ids, vendor_page_validators
+from points import all_points_balances
+
+#Vendor pages, their menus, bulk import and the co-preferred vendor build
+bp = Blueprint('vendors', __name__, cli_group=None)
+
+facet_index = FacetIndex()
+
+#Returns the facet index, built from the vendor table and kept current
+def get_facet_index():
+  return current_index(facet_index, table_state(Vendor), vendor_similarity_rows)
+
+#keeps the facet bitmaps in step with committed vendor changes
+def update_facet_index(changes):
+  for change in changes:
+    if change['action'] == 'delete':
+      facet_index.remove(change['vendor_id'])
+    else:
+      facet_index.update(change['vendor_id'], (change['category'], change['cuisine'], change['cost']))
+
+vendor_change_handlers.append(update_facet_index)
+
+#reads the selected category, cuisine and cost facets from the query string
+def requested_facets():
+  filters = {}
+  for field in FACET_FIELDS:
+    values = [value for value in request.args.getlist(field) if value]
+    if field == 'cost':
+      values = [int(value) for value in values if value.isdigit()]
+    if values:
+      filters[field] = values
+  return filters
+
+#The deal list shown on /vendors. It is kept in the page cache under the
+#vendors and deals tags, so every process drops it when either table changes.
+def load_deal_feed():
+  rows = db.session.query(Vendor.id, Vendor.name, Deals.item, Deals.price, Deals.points_required).join(
+    Deals, Deals.vendor_id == Vendor.id).order_by(Deals.id)
+  deals = []
+  for vendor_id, vendor_name, item, price, points_required in rows:
+    deals.append({
+      "vendor_id" : vendor_id,
+      "vendor_name": vendor_name,
+      "deal_item" : item,
+      "deal_price": price,
+      "deal_points": points_required
+    })
+  return deals
+
+def get_deal_feed():
+  page_cache = get_page_cache()
+  if page_cache is None:
+    return load_deal_feed()
+  return page_cache.fetch('deal-feed', ['vendors', 'deals'], load_deal_feed)
+
+#Show all the vendors
+@bp.route('/vendors')
+@cached_page(lambda: ['vendors', 'deals'])
+def vendors():
+
+  filters = requested_facets()
+  index = get_facet_index()
+  if filters:
+    vendor_ids, next_after = keyset_page_ids(index.select(filters))
+    vendors = Vendor.query.filter(Vendor.id.in_(vendor_ids)).order_by(db.desc(Vendor.id)).all()
+  else:
+    vendors, next_after = keyset_page(Vendor.query, Vendor.id)
+
+  data = {
+    "vendors" : vendors,
+    "deals" : get_deal_feed(),
+    "filters" : filters,
+    "facets" : index.counts(filters),
+    "next_after" : next_after,
+    "is_first_page" : 'after' not in request.args
+  }
+
+  return render_template('pages/vendors.html', data=data);
+
+#Search for vendors
+@bp.route('/vendors/search', methods=['POST'])
+def search_vendors():
+ 
+  search_term = request.form['search_term']
+  results = search_vendor_names(search_term)
+  response={
+    "count": len(results),
+    "data": []
+    }
+  for vendor_id, name in results:
+    response["data"].append({
+        "id": vendor_id,
+        "name": name
+      })
+  return render_template('pages/search_vendors.html', results=response, search_term=request.form.get('search_term', ''))
+
+#Show specific vendor with id = vendor_id
+@bp.route('/vendors/<int:vendor_id>')
+@conditional_page(vendor_page_validators)
+@cached_page(lambda vendor_id: ['vendors', 'vendor:{}'.format(vendor_id)])
+def show_vendor(vendor_id):
+
+  vendor = get_entity(Vendor, vendor_id)
+  
+  menuItems = vendor.menuItems
+  deals = vendor.offers
+  fullMenu = []
+  allDeals = []
+
+
+  for menu in menuItems: 
+    menu_info= {
+      "menu_id": menu.id,
+      "menu_item": menu.item,
+      "menu_price": menu.price
+    }
+    fullMenu.append(menu_info)
+
+  for deal in deals:
+    deal_info={
+      "item": deal.item,
+      "price": deal.price,
+      "points_required" : deal.points_required
+    }
+    allDeals.append(deal_info)
+
+  similar_vendors = find_most_similar(vendor_id, 3)
+  data={
+    "id": vendor.id,
+    "name": vendor.name,
+    "category": vendor.category,
+    "location": vendor.location,
+    "cuisine": vendor.cuisine,
+    "cost": vendor.cost*'$',
+    "purchase_to_points": vendor.purchase_to_points,
+    "fullMenu": fullMenu,
+    "allDeals" : allDeals,
+    "similar_vendors": similar_vendors
+  }
+  return render_template('pages/show_vendor.html', vendor=data)
+
+# Insert A Vendor
+@bp.route('/vendors/create', methods=['GET'])
+def create_vendor_form():
+  form = VendorForm()
+  return render_template('forms/new_vendor.html', form=form)
+
+@bp.route('/vendors/create', methods=['POST'])
+def create_vendor_submission():
+ 
+  new_vendor = Vendor()
+  new_vendor.name = request.form['name']
+  new_vendor.category = request.form['category']
+  new_vendor.cost = request.form['cost']
+  new_vendor.cuisine = request.form['cuisine']
+  new_vendor.location = request.form['location']
+  new_vendor.purchase_to_points = request.form['purchase_to_points']
+
+  try:
+    db.session.add(new_vendor)
+    db.session.commit()
+    flash('Vendor ' + request.form['name'] + ' was successfully listed!')
+  except:
+    db.session.rollback()
+    flash('An error occurred. Vendor ' + request.form['name'] + ' could not be listed.')
+  finally:
+    db.session.close()
+  return redirect(url_for('main.index'))
+
+#  Delete A Vendor
+@bp.route('/vendors/delete/<int:vendor_id>', methods=['GET', 'POST'])
+def delete_vendor(vendor_id):
+
+  deleted_vendor = get_entity(Vendor, vendor_id)
+  vendorName = deleted_vendor.name
+  try:
+    db.session.delete(deleted_vendor)
+    db.session.commit()
+    flash('Vendor ' + vendorName + ' was successfully deleted!')
+  except:
+    db.session.rollback()
+    flash('please try again. Vendor ' + vendorName + ' could not be deleted.')
+  finally:
+    db.session.close()
+  return redirect(url_for('main.index'))
+
+#Update Vendor Record
+@bp.route('/vendors/<int:vendor_id>/edit', methods=['POST','GET'])
+def edit_vendor(vendor_id):
+  form = VendorForm()
+  vendor = get_entity(Vendor, vendor_id)
+  data={
+    "id": vendor.id,
+    "name": vendor.name,
+    "category": vendor.category,
+    "location": vendor.location,
+    "cuisine": vendor.cuisine,
+    "cost" : vendor.cost*'$',
+    "purchase_to_points" : vendor.purchase_to_points
+  }
+  print("editing")
+  return render_template('forms/edit_vendor.html', form=form, vendor=data)
+
+@bp.route('/vendors/<int:vendor_id>/edit_info', methods=['POST'])
+def edit_vendor_submission(vendor_id):
+  vendor = get_entity(Vendor, vendor_id)
+
+  vendor.name = request.form['name']
+  vendor.category = request.form['category']
+  vendor.cuisine = request.form['cuisine']
+  vendor.cost = request.form['cost']
+  vendor.location = request.form['location']
+
+  try:
+    db.session.commit()
+    flash('Vendor ' + request.form['name'] + ' was successfully updated!')
+  except:
+    db.session.rollback()
+    flash('An error occurred. Venue ' + vendor.name + ' could not be updated.')
+  finally:
+    db.session.close()
+  return redirect(url_for('vendors.vendors', vendor_id=vendor_id))
+
+#  Bulk Vendor Import
+#  ----------------------------------------------------------------
+#Runs a form class over plain values and returns its errors, ignoring the named fields
+def form_errors(form_class, values, ignore=()):
+  formdata = MultiDict()
+  for field, value in values.items():
+    if value is not None and not isinstance(value, (list, dict)):
+      formdata.add(field, str(value))
+  form = form_class(formdata=formdata, meta={'csrf': False})
+  form.validate()
+  return dict((field, errors) for field, errors in form.errors.items() if field not in ignore)
+
+#Checks a vendor record and its nested menu and deals with the same rules as
+#VendorForm, MenuForm and DealForm. Returns the errors, empty when valid.
+#purchase_to_points is required, since purchases multiply by it.
+def vendor_record_errors(record):
+  errors = form_errors(VendorForm, record)
+  if not str(record.get('purchase_to_points')).isdigit():
+    errors['purchase_to_points'] = ['Not a valid integer value.']
+  menu = record.get('menu') or []
+  deals = record.get('deals') or []
+  if not isinstance(menu, list) or not isinstance(deals, list):
+    errors['menu'] = ['menu and deals must be lists']
+    return errors
+  for position, item in enumerate(menu):
+    item_errors = form_errors(MenuForm, item) if isinstance(item, dict) else {'item': ['must be an object']}
+    if item_errors:
+      errors['menu[{}]'.format(position)] = item_errors
+  for position, deal in enumerate(deals):
+    deal_errors = form_errors(DealForm, deal, ignore=('vendor_id',)) if isinstance(deal, dict) else {'item': ['must be an object']}
+    if not deal_errors:
+      for field in ('price', 'points_required'):
+        if not str(deal.get(field)).lstrip('-').isdigit():
+          deal_errors[field] = ['Not a valid integer value.']
+    if deal_errors:
+      errors['deals[{}]'.format(position)] = deal_errors
+  return errors
+
+def vendor_from_record(record):
+  vendor = Vendor(
+    name=record['name'],
+    category=record['category'],
+    cuisine=record['cuisine'],
+    cost=int(record['cost']),
+    location=record.get('location'),
+    purchase_to_points=int(record['purchase_to_points'])
+  )
+  for item in record.get('menu') or []:
+    price = item.get('price')
+    vendor.menuItems.append(Menu(item=item['item'], price=int(price) if price not in (None, '') else None))
+  for deal in record.get('deals') or []:
+    vendor.offers.append(Deals(item=deal['item'], price=int(deal['price']), points_required=int(deal['points_required'])))
+  return vendor
+
+#Imports (line_number, record, error) vendor records batch by batch. Each
+#batch is added in one flush, which the ORM sends as multi-row inserts per
+#table. If a batch fails in the database its rows are retried one by one so a
+#single bad row only fails itself. Yields the running report after every batch.
+def import_vendors(records, batch_size):
+  report = {"processed": 0, "imported": 0, "failed": 0, "errors": []}
+  max_errors = current_app.config.get('INGEST_MAX_REPORTED_ERRORS', 100)
+
+  def reject(line_number, errors):
+    report["failed"] += 1
+    if len(report["errors"]) < max_errors:
+      report["errors"].append({"line": line_number, "errors": errors})
+
+  def save(batch):
+    try:
+      db.session.add_all([vendor_from_record(record) for line_number, record in batch])
+      db.session.commit()
+      return True
+    except Exception:
+      db.session.rollback()
+      return False
+
+  for chunk in chunked(records, batch_size):
+    valid = []
+    for line_number, record, error in chunk:
+      errors = {"record": [error]} if error else vendor_record_errors(record)
+      if errors:
+        reject(line_number, errors)
+      else:
+        valid.append((line_number, record))
+
+    if valid and save(valid):
+      report["imported"] += len(valid)
+    else:
+      for line_number, record in valid:
+        if save([(line_number, record)]):
+          report["imported"] += 1
+        else:
+          reject(line_number, {"record": ['could not be saved']})
+    report["processed"] += len(chunk)
+    yield report
+  db.session.close()
+
+@bp.cli.command('import-vendors')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', type=int, default=None, help='Vendors per transaction.')
+def import_vendors_command(path, batch_size):
+  batch_size = batch_size or current_app.config.get('IMPORT_BATCH_SIZE', 500)
+  report = None
+  with io.open(path, encoding='utf-8') as stream:
+    for report in import_vendors(read_records(stream, 'jsonl'), batch_size):
+      click.echo('{processed} vendors, {imported} imported, {failed} failed'.format(**report))
+  if report:
+    for error in report["errors"]:
+      click.echo('line {}: {}'.format(error["line"], json.dumps(error["errors"])), err=True)
+
+#Imports vendors posted as JSONL, or as a JSON array, and returns the report
+@bp.route('/api/vendors/import', methods=['POST'])
+def import_vendors_endpoint():
+  batch_size = request.args.get('batch_size', current_app.config.get('IMPORT_BATCH_SIZE', 500), type=int)
+  if request.is_json:
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, list):
+      return jsonify({"error": "expected a JSON array of vendors"}), 400
+    records = ((position, record, None if isinstance(record, dict) else 'expected a JSON object')
+      for position, record in enumerate(payload, 1))
+  else:
+    records = read_records(io.TextIOWrapper(request.stream, encoding='utf-8'), 'jsonl')
+
+  report = {"processed": 0, "imported": 0, "failed": 0, "errors": []}
+  for report in import_vendors(records, batch_size):
+    pass
+  return jsonify(report)
+
+
+#  Add or Delete Menu Item 
+ #  ----------------------------------------------------------------
+
+@bp.route('/vendors/<int:vendor_id>/add_menu_item', methods=['GET'])
+def create_add_menu_form(vendor_id):
+  form = MenuForm()
+  return render_template('forms/new_menu.html', form=form, vendor_id=vendor_id)
+
+@bp.route('/vendors/<int:vendor_id>/add_menu_item', methods=['POST'])
+def create_add_menu_submission(vendor_id):
+  new_menu = Menu()
+  new_menu.item = (request.form['item'])
+  new_menu.price = int (request.form['price'])
+  
+  new_menu.vendor_id = vendor_id
+
+  try:
+    db.session.add(new_menu)
+    db.session.commit()
+     # on successful db insert, flash success
+    flash('Item ' + request.form['item'] + ' were successfully added to the menu')
+  except:
+    db.session.rollback()
+     #on unsuccessful db insert, flash an error instead.
+    flash('An error occurred. Item ' + new_menu.item + ' could not be added to the menu')
+  finally:
+    db.session.close()
+  return redirect(url_for('main.index'))
+
+#Delete menu item
+@bp.route('/vendors/<int:vendor_id>/delete_menu_item', methods=['GET', 'POST'])
+def create_delete_menu_form(vendor_id):
+  vendor = get_entity(Vendor, vendor_id)
+
+  menuItems = vendor.menuItems
+  fullMenu = []
+
+  for menu in menuItems: 
+    menu_info= {
+      "menu_id": menu.id,
+      "menu_item": menu.item,
+      "menu_price": menu.price
+    }
+    fullMenu.append(menu_info)
+
+  data = {
+    "vendor_id" : vendor_id,
+    "menu" : fullMenu
+  }
+  return render_template('forms/delete_menu.html', data=data)
+
+@bp.route('/vendors/<int:vendor_id>/delete_menu_info', methods=['POST'])
+def create_delete_menu_item_submission(vendor_id):
+  menu_id = request.form['item']
+  deleted_menu = get_entity(Menu, menu_id)
+  try:
+    db.session.delete(deleted_menu)
+    db.session.commit()
+    flash('Menu Item removed from Menu')
+  except:
+    db.session.rollback()
+    flash('Item could not be removed from menu')
+  finally:
+    db.session.close()
+  return redirect(url_for('vendors.vendors', vendor_id=vendor_id))
+
+
+#  Co-preferred Vendors
+#  ----------------------------------------------------------------
+#Rebuilds vendor_neighbors from the favorites table and the non-zero points
+#balances, read through all_points_balances() so ledger rows not compacted yet
+#count as well
+@bp.cli.command('build-vendor-neighbors')
+def build_vendor_neighbors():
+  chunk_size = current_app.config.get('VENDOR_NEIGHBORS_CHUNK_SIZE', 50000)
+  top_n = current_app.config.get('VENDOR_NEIGHBORS_TOP_N', 10)
+
+  favorite_pairs = db.select(favorites.c.user_id, favorites.c.vendor_id)
+  balances = all_points_balances().order_by(None).subquery()
+  reward_pairs = db.select(balances.c.user_id, balances.c.vendor_id).where(balances.c.points != 0)
+
+  def chunks():
+    for stmt in (favorite_pairs, reward_pairs):
+      for chunk in stream_pairs(stmt, chunk_size):
+        yield chunk
+
+  #scipy is only needed here, so it is not imported by the web workers
+  from collaborative import top_co_preferred
+  neighbors = top_co_preferred(chunks(), top_n)
+
+  try:
+    db.session.execute(VendorNeighbor.__table__.delete())
+    batch = []
+    for vendor_id, ranked in neighbors.items():
+      for rank, (neighbor_id, score) in enumerate(ranked):
+        batch.append({"vendor_id": vendor_id, "rank": rank, "neighbor_id": neighbor_id, "score": score})
+      if len(batch) >= chunk_size:
+        db.session.execute(VendorNeighbor.__table__.insert(), batch)
+        batch = []
+    if batch:
+      db.session.execute(VendorNeighbor.__table__.insert(), batch)
+    record_cache_tags('vendor-neighbors')
+    db.session.commit()
+  except:
+    db.session.rollback()
+    raise
+  finally:
+    db.session.close()
+  print("Stored neighbors for", len(neighbors), "vendors")
@@ -0,0 +1,228 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+#Write-behind queue with a durable local spool.
+#put() appends the entry to this process's spool file and fsyncs it before
+#returning, then a background thread hands entries to apply_batch(entries) in
+#micro-batches of up to max_batch entries, or whatever is queued once the
+#oldest entry has waited max_delay seconds. apply_batch must be idempotent on
+#entry["key"]: after a crash the spool is replayed and entries that were
+#already committed come around again.
+#Each process holds an flock on its own spool file, so on start any spool
+#left by a dead process is found, replayed and removed.
+#A batch failing with one of permanent_errors is applied again one entry at a
+#time, and the entries that still fail are appended to dead-letter.jsonl in
+#the spool directory instead of blocking the queue. Any other error is taken
+#as transient and the batch is retried.
+class WriteBehindQueue(object):
+
+    def __init__(self, spool_dir, apply_batch, max_batch=500, max_delay=0.05, fsync=True, permanent_errors=()):
+        self.spool_dir = spool_dir
+        self.apply_batch = apply_batch
+        self.permanent_errors = tuple(permanent_errors)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.fsync = fsync
+        self.started = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._entries = deque()
+        self._spool = None
+        self._spool_path = None
+        self._spooled = 0
+        self._thread = None
+        self.stats = {
+            "enqueued": 0,
+            "flushed": 0,
+            "batches": 0,
+            "failures": 0,
+            "dead_lettered": 0,
+            "last_flush_ms": 0.0,
+            "total_flush_ms": 0.0
+        }
+
+    def start(self):
+        with self._lock:
+            if self.started:
+                return
+            if not os.path.isdir(self.spool_dir):
+                os.makedirs(self.spool_dir)
+            self._open_spool()
+            for path in glob.glob(os.path.join(self.spool_dir, 'spool-*.jsonl')):
+                if path != self._spool_path:
+                    self._recover(path)
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+            self.started = True
+
+    def _open_spool(self):
+        self._spool_path = os.path.join(self.spool_dir, 'spool-{}-{}.jsonl'.format(os.getpid(), uuid.uuid4().hex[:8]))
+        self._spool = open(self._spool_path, 'a+', encoding='utf-8')
+        if fcntl is not None:
+            fcntl.flock(self._spool.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    #Moves the entries of an orphaned spool file into this process's queue
+    def _recover(self, path):
+        with open(path, 'r+', encoding='utf-8') as orphan:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(orphan.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except (IOError, OSError):
+                    return
+            entries = []
+            for line in orphan:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    logger.warning('skipping a torn line in %s', path)
+            for entry in entries:
+                self._write(entry)
+                self._entries.append(entry)
+        os.remove(path)
+        if entries:
+            logger.info('recovered %d queued entries from %s', len(entries), path)
+
+    def _write(self, entry):
+        self._spool.write(json.dumps(entry) + '\n')
+        self._spool.flush()
+        if self.fsync:
+            os.fsync(self._spool.fileno())
+        self._spooled += 1
+
+    #Durably queues an entry and returns its key
+    def put(self, entry):
+        if not self.started:
+            self.start()
+        entry = dict(entry, key=entry.get('key') or uuid.uuid4().hex, queued_at=time.time())
+        with self._lock:
+            self._write(entry)
+            self._entries.append(entry)
+            self.stats["enqueued"] += 1
+            self._ready.notify()
+        return entry["key"]
+
+    def depth(self):
+        return len(self._entries)
+
+    def metrics(self):
+        with self._lock:
+            metrics = dict(self.stats)
+            metrics["depth"] = len(self._entries)
+            metrics["oldest_age_ms"] = (time.time() - self._entries[0]["queued_at"]) * 1000 if self._entries else 0.0
+            metrics["average_flush_ms"] = metrics["total_flush_ms"] / metrics["batches"] if metrics["batches"] else 0.0
+        return metrics
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._entries:
+                    self._ready.wait()
+                deadline = self._entries[0]["queued_at"] + self.max_delay
+                while len(self._entries) < self.max_batch and time.time() < deadline:
+                    self._ready.wait(max(deadline - time.time(), 0.001))
+            self.flush()
+
+    #Applies up to max_batch queued entries in one call; returns how many left
+    #the queue, applied or dead-lettered
+    def flush(self):
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        with self._lock:
+            batch = [self._entries[position] for position in range(min(self.max_batch, len(self._entries)))]
+        if not batch:
+            return 0
+        started = time.time()
+        dead = 0
+        try:
+            self.apply_batch(batch)
+            done = len(batch)
+        except self.permanent_errors:
+            logger.warning('write-behind batch of %d entries was rejected, applying them one at a time', len(batch))
+            done, dead = self._apply_singly(batch)
+        except Exception:
+            logger.exception('write-behind flush of %d entries failed', len(batch))
+            with self._lock:
+                self.stats["failures"] += 1
+            done = 0
+        if not done:
+            time.sleep(min(1.0, self.max_delay * 10))
+            return 0
+        elapsed = (time.time() - started) * 1000
+        with self._lock:
+            for _ in range(done):
+                self._entries.popleft()
+            self.stats["flushed"] += done - dead
+            self.stats["dead_lettered"] += dead
+            self.stats["batches"] += 1
+            self.stats["last_flush_ms"] = elapsed
+            self.stats["total_flush_ms"] += elapsed
+            self._compact_spool()
+        return done
+
+    #Applies a rejected batch entry by entry. Returns (done, dead): how many
+    #leading entries were applied or dead-lettered, stopping at the first
+    #transient failure, and how many of those were dead-lettered.
+    def _apply_singly(self, batch):
+        dead = 0
+        for position, entry in enumerate(batch):
+            try:
+                self.apply_batch([entry])
+            except self.permanent_errors:
+                logger.exception('moving write-behind entry %s to the dead-letter file', entry["key"])
+                self._dead_letter(entry)
+                dead += 1
+            except Exception:
+                logger.exception('write-behind entry %s failed', entry["key"])
+                with self._lock:
+                    self.stats["failures"] += 1
+                return position, dead
+        return len(batch), dead
+
+    #Durably appends an entry that can never be applied to dead-letter.jsonl,
+    #before it leaves the spool
+    def _dead_letter(self, entry):
+        with open(os.path.join(self.spool_dir, 'dead-letter.jsonl'), 'a', encoding='utf-8') as dead_letter:
+            dead_letter.write(json.dumps(entry) + '\n')
+            dead_letter.flush()
+            if self.fsync:
+                os.fsync(dead_letter.fileno())
+
+    #Drops applied entries from the spool: truncates it when the queue is empty,
+    #and once it has grown large moves the pending entries to a fresh spool file
+    #before removing the old one, so a crash in between only replays entries
+    def _compact_spool(self):
+        if not self._entries:
+            self._spool.seek(0)
+            self._spool.truncate()
+            self._spooled = 0
+        elif self._spooled > 4 * self.max_batch + 2 * len(self._entries):
+            old_spool, old_path = self._spool, self._spool_path
+            self._open_spool()
+            self._spooled = 0
+            for entry in self._entries:
+                self._write(entry)
+            old_spool.close()
+            os.remove(old_path)
+
+    #Applies everything still queued, for shutdown
+    def drain(self):
+        while self._entries:
+            if not self.flush():
+                break